@@ -0,0 +1,224 @@
+import os
+import sys
+import json
+import time
+import math
+import argparse
+import platform
+import numpy as np
+
+# Headless benchmarks of the simulation and render hot paths.
+# Run with: python benchmark.py --output results.json [--compare old.json]
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+import main as app
+
+
+
+def time_calls(function, calls, warmup=20):
+    # Per call latencies in nanoseconds
+    for i in range(warmup):
+        function(i)
+
+    latencies = np.empty(calls, dtype=np.int64)
+    for i in range(calls):
+        start = time.perf_counter_ns()
+        function(i)
+        latencies[i] = time.perf_counter_ns() - start
+
+    return latencies
+
+
+def summarise(latencies):
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+    total = latencies.sum()
+    return {
+        "calls": int(len(latencies)),
+        "mean_us": float(latencies.mean() / 1000),
+        "p50_us": float(p50 / 1000),
+        "p90_us": float(p90 / 1000),
+        "p99_us": float(p99 / 1000),
+        "max_us": float(latencies.max() / 1000),
+        "calls_per_second": float(len(latencies) / (total / 1e9)) if total else math.inf,
+    }
+
+
+
+def bench_interferometer_update(calls, cavities=False):
+    interferometer = app.Interferometer(wavelength=1064, amplitude=0.5)
+    interferometer.set_cavities(cavities)
+    mirror = interferometer.right_mirror
+    mirror.drag = True
+
+    # Drag the right mirror back and forth so every call does real work
+    def update(i):
+        interferometer.update(1 / app.PHYSICS_RATE, (mirror.min_pos + i % 300, mirror.pos[1]), False)
+
+    return time_calls(update, calls)
+
+
+def bench_interferometer_update_distorting(calls, cavities=False, broadband=False):
+    interferometer = app.Interferometer(wavelength=1064, amplitude=0.5)
+    interferometer.set_cavities(cavities)
+    if broadband:
+        interferometer.set_spectrum(app.white_light_spectrum())
+
+    def update(i):
+        interferometer.update(1 / app.PHYSICS_RATE, None, True)
+
+    return time_calls(update, calls)
+
+
+def bench_laser_draw(calls, realistic):
+    app.realistic = realistic
+    laser = app.Laser((app.WIDTH/4+25, app.HEIGHT/2), (7*app.WIDTH/8, app.HEIGHT/2), 4, 0.5, 1064)
+
+    # A new phase each call so the waveform cache doesn't hide the cost
+    def draw(i):
+        laser.phase = (i % app.PHASE_STEPS) / app.PHASE_STEPS * 2*math.pi
+        laser.draw()
+
+    try:
+        return time_calls(draw, calls)
+    finally:
+        app.realistic = False
+
+
+def bench_graph_draw(calls, n_points):
+    graph = app.Graph((app.WIDTH/2, app.HEIGHT-125), app.WIDTH*3.5/4, 250, (10, 10, 15), x_start=0, x_end=30, y_start=0, y_end=1)
+
+    times = np.arange(n_points) * graph.graph_time
+    graph.points.extend(np.column_stack((times, 0.5 + 0.5*np.sin(times))))
+    graph.graph_total_time = times[-1]
+    graph.x_end = max(30, graph.graph_total_time)
+    graph.x_range = graph.x_end - graph.x_start
+
+    # A sample arrives every frame, like while graphing
+    def draw(i):
+        graph.update(graph.graph_time, True, 0.5 + 0.5*math.sin(i))
+        graph.draw()
+
+    return time_calls(draw, calls)
+
+
+def bench_network(calls, n_detectors, draw):
+    network = app.random_network(n_detectors)
+    network.set_source(app.SinusoidalStrain(amplitude=5e-5, frequency=1))
+    view = app.NetworkView((app.WIDTH/2, app.HEIGHT-125), app.WIDTH*3.5/4, 250, network)
+    view.visible = True
+
+    # One frame of physics steps per call, a new sample each time
+    def update(i):
+        view.update((np.arange(17) + 17*i) / app.PHYSICS_RATE, True)
+        if draw:
+            view.draw()
+
+    return time_calls(update, calls)
+
+
+def bench_detector_screen_draw(calls, resolution):
+    interferometer = app.Interferometer(wavelength=1064, amplitude=0.5)
+    screen = app.DetectorScreen((0, 0), resolution)
+    screen.visible = True
+    interferometer.top_mirror.set_tilt(2e-4)
+
+    # A new path each call so the whole pattern is recomputed
+    def draw(i):
+        interferometer.right_path = 2_000_000 + 10 * i
+        screen.draw(interferometer)
+
+    return time_calls(draw, calls)
+
+
+def bench_rotated_rectangle_draw(calls):
+    rectangle = app.RotatedRectangle((app.WIDTH/2, app.HEIGHT/2), 50, 10, 45, (100, 200, 255))
+
+    def draw(i):
+        rectangle.draw()
+
+    return time_calls(draw, calls)
+
+
+
+BENCHMARKS = {
+    "interferometer_update": lambda calls: bench_interferometer_update(calls),
+    "interferometer_update_cavities": lambda calls: bench_interferometer_update(calls, True),
+    "interferometer_update_distorting": lambda calls: bench_interferometer_update_distorting(calls),
+    "interferometer_update_broadband_cavities_distorting": lambda calls: bench_interferometer_update_distorting(calls, True, True),
+    "laser_draw_line": lambda calls: bench_laser_draw(calls, False),
+    "laser_draw_realistic": lambda calls: bench_laser_draw(calls, True),
+    "graph_draw_1k": lambda calls: bench_graph_draw(calls, 1_000),
+    "graph_draw_100k": lambda calls: bench_graph_draw(calls, 100_000),
+    "graph_draw_1m": lambda calls: bench_graph_draw(calls, 1_000_000),
+    "network_update_256": lambda calls: bench_network(calls, 256, False),
+    "network_draw_256": lambda calls: bench_network(calls, 256, True),
+    "network_draw_1024": lambda calls: bench_network(calls, 1024, True),
+    "detector_screen_draw_512": lambda calls: bench_detector_screen_draw(calls, 512),
+    "detector_screen_draw_1024": lambda calls: bench_detector_screen_draw(calls, 1024),
+    "rotated_rectangle_draw": lambda calls: bench_rotated_rectangle_draw(calls),
+}
+
+
+def compare(results, baseline, threshold):
+    # Returns the names of benchmarks whose p50 got slower than threshold times the baseline
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+
+        ratio = result["p50_us"] / max(baseline[name]["p50_us"], 1e-9)
+        flag = "  REGRESSION" if ratio > threshold else ""
+        print(f"{name:36s} {baseline[name]['p50_us']:10.2f} -> {result['p50_us']:10.2f} us  x{ratio:.2f}{flag}")
+
+        if ratio > threshold:
+            regressions.append(name)
+
+    return regressions
+
+
+def run(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the interferometer simulation and rendering")
+    parser.add_argument("--calls", type=int, default=2000, help="timed calls per benchmark")
+    parser.add_argument("--only", nargs="*", choices=list(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument("--output", help="JSON file to save the results to")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2, help="slowdown ratio that counts as a regression")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name in args.only or BENCHMARKS:
+        results[name] = summarise(BENCHMARKS[name](args.calls))
+        result = results[name]
+        print(f"{name:36s} p50 {result['p50_us']:10.2f} us  p99 {result['p99_us']:10.2f} us  {result['calls_per_second']:12.0f} calls/s")
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pygame": pygame.version.ver,
+        "machine": platform.platform(),
+        "calls": args.calls,
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)["results"]
+
+        print()
+        if compare(results, baseline, args.threshold):
+            return 1
+
+    return 0
+
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,125 @@
+import numpy as np
+
+# Array backed sample storage and decimation for plotting. No pygame in here.
+
+
+
+class RingBuffer():
+    # Preallocated rows of float64 samples
+    # With grow=True the storage doubles when full so no sample is ever lost,
+    # otherwise the oldest samples are overwritten once capacity is reached
+    def __init__(self, columns, capacity=1024, grow=True) -> None:
+        self.columns = columns
+        self.grow = grow
+
+        self.data = np.empty((capacity, columns), dtype=np.float64)
+        self.start = 0 # index of the oldest sample
+        self.length = 0
+
+    @property
+    def capacity(self):
+        return len(self.data)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("RingBuffer index out of range")
+
+        return tuple(self.data[(self.start + index) % self.capacity].tolist())
+
+    def __iter__(self):
+        for row in self.array():
+            yield tuple(row.tolist())
+
+    def clear(self):
+        self.start = 0
+        self.length = 0
+
+    def resize(self, capacity):
+        data = np.empty((capacity, self.columns), dtype=np.float64)
+        data[:self.length] = self.array()
+        self.data = data
+        self.start = 0
+
+    def append(self, row):
+        if self.length == self.capacity:
+            if self.grow:
+                self.resize(self.capacity * 2)
+            else:
+                # Overwrite the oldest sample
+                self.data[self.start] = row
+                self.start = (self.start + 1) % self.capacity
+                return
+
+        self.data[(self.start + self.length) % self.capacity] = row
+        self.length += 1
+
+    def extend(self, rows):
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, self.columns)
+        if self.grow and self.length + len(rows) > self.capacity:
+            capacity = self.capacity
+            while capacity < self.length + len(rows):
+                capacity *= 2
+            self.resize(capacity)
+
+        # Only the newest capacity rows can survive
+        rows = rows[-self.capacity:]
+        end = (self.start + self.length) % self.capacity
+        first = min(len(rows), self.capacity - end)
+        self.data[end:end + first] = rows[:first]
+        self.data[:len(rows) - first] = rows[first:]
+
+        overflow = max(0, self.length + len(rows) - self.capacity)
+        self.start = (self.start + overflow) % self.capacity
+        self.length = min(self.capacity, self.length + len(rows))
+
+    def array(self):
+        # Samples oldest first, a view when they don't wrap around the end
+        end = self.start + self.length
+        if end <= self.capacity:
+            return self.data[self.start:end]
+        return np.concatenate((self.data[self.start:], self.data[:end - self.capacity]))
+
+    def column(self, index):
+        return self.array()[:, index]
+
+
+
+def min_max_decimate(x, y, x_start, x_end, pixels):
+    # Reduces sorted samples to at most four per pixel column: the first, minimum,
+    # maximum and last value. Drawn as a line this looks the same as every sample.
+    if len(x) <= 4 * pixels:
+        return x, y
+
+    edges = np.linspace(x_start, x_end, pixels + 1)
+    bounds = np.searchsorted(x, edges)
+    starts = np.unique(bounds[:-1][bounds[:-1] < bounds[1:]])
+    # Samples past x_end go into the last column
+    if bounds[-1] < len(x):
+        starts = np.union1d(starts, bounds[-1:])
+    if len(starts) == 0 or starts[0] != 0:
+        starts = np.concatenate(([0], starts))
+
+    ends = np.append(starts[1:], len(x))
+
+    mins = np.minimum.reduceat(y, starts)
+    maxs = np.maximum.reduceat(y, starts)
+
+    out_x = np.empty(len(starts) * 4)
+    out_y = np.empty(len(starts) * 4)
+
+    out_x[0::4] = x[starts]
+    out_x[1::4] = x[starts]
+    out_x[2::4] = x[ends - 1]
+    out_x[3::4] = x[ends - 1]
+
+    out_y[0::4] = y[starts]
+    out_y[1::4] = mins
+    out_y[2::4] = maxs
+    out_y[3::4] = y[ends - 1]
+
+    return out_x, out_y
@@ -0,0 +1,66 @@
+import numpy as np
+
+# Wavelength to colour lookup table, so colouring a beam or a whole spectrum is
+# an array index instead of a chain of comparisons. Colours are RGB from 0 to 1.
+
+TABLE_SIZE = 1101 # covers 0 to 1100 nm in 1 nm steps, anything else is white
+
+
+
+def build_colour_table():
+    wavelength = np.arange(TABLE_SIZE, dtype=np.float64)
+    table = np.ones((TABLE_SIZE, 3))
+
+    bands = [
+        # (start, stop, R, G, B) where each colour is a value or a function of the wavelength
+        (380, 460, lambda w: (460 - w) / (460 - 380), 0, 1),
+        (460, 510, 0, lambda w: (w - 460) / (510 - 460), 1),
+        (510, 550, 0, 1, lambda w: (550 - w) / (550 - 510)),
+        (550, 600, lambda w: (w - 550) / (600 - 550), 1, 0),
+        (600, 700, 1, lambda w: (700 - w) / (700 - 600), 0),
+    ]
+
+    # Later bands are filled first so shared edges end up with the earlier band, as before
+    for start, stop, *channels in reversed(bands):
+        inside = (wavelength >= start) & (wavelength <= stop)
+        for i, channel in enumerate(channels):
+            table[inside, i] = channel(wavelength[inside]) if callable(channel) else channel
+
+    # Infrared Nd:YAG laser line drawn as red
+    table[1064] = (1, 0, 0)
+
+    return table
+
+
+COLOUR_TABLE = build_colour_table()
+COLOUR_LIST = [tuple(colour) for colour in COLOUR_TABLE.tolist()]
+
+
+
+def wavelength_colour(wavelength):
+    # Colour of a single wavelength as an (R, G, B) tuple
+    index = int(round(wavelength))
+    if 0 <= index < TABLE_SIZE:
+        return COLOUR_LIST[index]
+    return (1, 1, 1)
+
+
+def wavelength_colours(wavelengths):
+    # Colours of an array of wavelengths, shape (..., 3)
+    index = np.rint(wavelengths).astype(np.int64)
+    inside = (index >= 0) & (index < TABLE_SIZE)
+    colours = COLOUR_TABLE[np.clip(index, 0, TABLE_SIZE - 1)]
+    colours[~inside] = 1
+    return colours
+
+
+def spectrum_colour(spectrum):
+    # Power weighted mix of the colours of every line, scaled so the brightest channel is 1
+    colour = spectrum.weights @ wavelength_colours(spectrum.wavelengths)
+    return tuple((colour / max(colour.max(), 1e-12)).tolist())
+
+
+def scale_colour(colour, amplitude):
+    # 0-255 integer colour at the given brightness
+    amplitude = min(1, amplitude)
+    return (int(colour[0] * 255 * amplitude), int(colour[1] * 255 * amplitude), int(colour[2] * 255 * amplitude))
@@ -0,0 +1,81 @@
+import numpy as np
+
+# The 2D interference pattern on a screen at the detector. Both arms return a
+# Gaussian beam from the same diverging source. Different arm lengths give the
+# beams different wavefront curvatures, which makes circular fringes, and
+# mirror tilt adds a linear phase across the screen, which makes straight ones.
+#
+# Every term of the intensity is a function of x times a function of y, so
+# the whole image is one small matrix product of precomputed 1D vectors rather
+# than an elementwise expression over every pixel. No pygame in here.
+
+
+
+class FringePattern():
+    def __init__(self, resolution=512, width=6e-3, waist=5e-6, distance=0.03) -> None:
+        # width is the side of the screen, waist the source beam waist and distance from
+        # the waist to the screen with both arms at zero length, all in metres
+        self.resolution = resolution
+        self.width = width
+        self.waist = waist
+        self.distance = distance
+
+        # Pixel centre coordinates, the same along x and y
+        self.coords = (np.arange(resolution) - (resolution - 1) / 2) * (width / resolution)
+        self.coords_squared = self.coords**2
+
+        # Reused every evaluation, the image is left @ right. It is stored y major, like
+        # a pygame surface's pixels, so copying it into one reads and writes in order
+        self.left = np.empty((resolution, 5), dtype=np.float32)
+        self.right = np.empty((5, resolution), dtype=np.float32)
+        self.image = np.empty((resolution, resolution), dtype=np.float32)
+
+    def beam(self, path, wavelength):
+        # Relative amplitude, radius, wavefront curvature and Gouy phase of a beam
+        # after a round trip along an arm of path nanometres
+        z = self.distance + 2 * path * 1e-9
+        rayleigh = np.pi * self.waist**2 / (wavelength * 1e-9)
+
+        radius = self.waist * np.sqrt(1 + (z / rayleigh)**2)
+        curvature = z / (z**2 + rayleigh**2)
+        return self.waist / radius, radius, curvature, np.arctan(z / rayleigh)
+
+    def evaluate(self, top_path, right_path, top_tilt, right_tilt, wavelength, scale=1, offset=0):
+        # Intensity from 0 to 1 at every pixel, indexed [x, y] like pygame.surfarray.
+        # The result is scale * intensity + offset, so it can be mapped to pixel values in the same product.
+        # Tilts are in radians in the plane of the table, which tilts both beams along x.
+        k = 2*np.pi / (wavelength * 1e-9)
+        top_amplitude, top_radius, top_curvature, top_gouy = self.beam(top_path, wavelength)
+        right_amplitude, right_radius, right_curvature, right_gouy = self.beam(right_path, wavelength)
+
+        # Phase difference at the centre, with the path taken exactly in nanometres,
+        # and half a wave from the beam splitter so equal arms are dark like InterferometerEngine
+        phase = 2*np.pi * np.mod(2 * (top_path - right_path), wavelength) / wavelength - (top_gouy - right_gouy) + np.pi
+        quadratic = k / 2 * (top_curvature - right_curvature)
+        linear = 2 * k * (top_tilt - right_tilt)
+
+        norm = scale / (top_amplitude + right_amplitude)**2
+        cross_width = 1 / top_radius**2 + 1 / right_radius**2
+
+        # cos(p(x) + q(y)) = cos p cos q - sin p sin q
+        p = phase + quadratic * self.coords_squared + linear * self.coords
+        q = quadratic * self.coords_squared
+        cross_x = np.exp(-cross_width * self.coords_squared)
+
+        self.left[:, 0] = norm * top_amplitude**2 * np.exp(-2 / top_radius**2 * self.coords_squared)
+        self.right[0] = np.exp(-2 / top_radius**2 * self.coords_squared)
+
+        self.left[:, 1] = norm * right_amplitude**2 * np.exp(-2 / right_radius**2 * self.coords_squared)
+        self.right[1] = np.exp(-2 / right_radius**2 * self.coords_squared)
+
+        self.left[:, 2] = 2 * norm * top_amplitude * right_amplitude * cross_x * np.cos(p)
+        self.right[2] = cross_x * np.cos(q)
+
+        self.left[:, 3] = -2 * norm * top_amplitude * right_amplitude * cross_x * np.sin(p)
+        self.right[3] = cross_x * np.sin(q)
+
+        self.left[:, 4] = offset
+        self.right[4] = 1
+
+        np.matmul(self.right.T, self.left.T, out=self.image)
+        return self.image.T
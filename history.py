@@ -0,0 +1,179 @@
+import math
+import tempfile
+import threading
+import numpy as np
+
+from buffers import min_max_decimate
+
+# Out-of-core history of (time, value) samples for long runs. Samples are
+# appended to a file and read back through memory maps, so only the part on
+# screen is ever paged in. A min/max pyramid is built as samples arrive:
+# level k holds a (first time, last time, min, max) row for every FANOUT**k
+# samples, and a view reads only the level with about two rows per pixel, so
+# drawing costs the same whether the run holds a thousand samples or a billion.
+# Times must not decrease. In threaded mode one thread appends while another
+# draws, so every method holds the history's lock.
+
+FANOUT = 8
+
+
+
+def aggregate(rows):
+    # Whole blocks of FANOUT (first time, last time, min, max) rows into one row each
+    blocks = rows.reshape(-1, FANOUT, 4)
+
+    aggregated = np.empty((len(blocks), 4))
+    aggregated[:, 0] = blocks[:, 0, 0]
+    aggregated[:, 1] = blocks[:, -1, 1]
+    aggregated[:, 2] = blocks[:, :, 2].min(axis=1)
+    aggregated[:, 3] = blocks[:, :, 3].max(axis=1)
+    return aggregated
+
+
+class Level():
+    def __init__(self, columns, directory=None) -> None:
+        self.columns = columns
+        self.directory = directory
+
+        self.file = tempfile.TemporaryFile(dir=directory)
+        self.rows = 0
+        self.map = None # memory map of the rows written, remade once more have been written
+
+        # Rows of the level below still waiting to fill a block
+        self.partial = np.empty((0, 4))
+
+    def write(self, rows):
+        self.file.write(np.ascontiguousarray(rows, dtype=np.float64).tobytes())
+        self.rows += len(rows)
+
+    def read(self):
+        rows = self.rows
+        if self.map is None or len(self.map) != rows:
+            self.file.flush()
+            if rows:
+                self.map = np.memmap(self.file, dtype=np.float64, mode="r", shape=(rows, self.columns))
+            else:
+                self.map = np.empty((0, self.columns))
+        return self.map
+
+    def clear(self):
+        # A new file rather than truncating, arrays already handed out still map the old one
+        self.file = tempfile.TemporaryFile(dir=self.directory)
+        self.rows = 0
+        self.map = None
+        self.partial = np.empty((0, 4))
+
+
+
+class PyramidHistory():
+    def __init__(self, directory=None) -> None:
+        # directory is where the files go, the system temporary directory by default
+        self.directory = directory
+        self.levels = [Level(2, directory)] # raw (time, value) rows, then the pyramid
+        self.last = None
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return self.levels[0].rows
+
+    def __getitem__(self, index):
+        with self.lock:
+            if index == -1 and self.last is not None:
+                return self.last
+
+            if index < 0:
+                index += len(self)
+            if not 0 <= index < len(self):
+                raise IndexError("history index out of range")
+            return tuple(self.levels[0].read()[index].tolist())
+
+    def __iter__(self):
+        for row in self.array():
+            yield tuple(row.tolist())
+
+    def clear(self):
+        with self.lock:
+            self.levels = [Level(2, self.directory)]
+            self.last = None
+
+    def append(self, row):
+        self.extend((row,))
+
+    def extend(self, rows):
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, 2)
+        if len(rows) == 0:
+            return
+
+        with self.lock:
+            self.extend_locked(rows)
+
+    def extend_locked(self, rows):
+        self.levels[0].write(rows)
+        self.last = tuple(rows[-1].tolist())
+
+        # Each level turns whole blocks of the rows below into new rows and passes them up
+        new_rows = np.column_stack((rows[:, 0], rows[:, 0], rows[:, 1], rows[:, 1]))
+        k = 1
+        while len(new_rows):
+            if k == len(self.levels):
+                self.levels.append(Level(4, self.directory))
+            level = self.levels[k]
+
+            rows = np.concatenate((level.partial, new_rows))
+            whole = len(rows) // FANOUT * FANOUT
+            level.partial = rows[whole:]
+
+            new_rows = aggregate(rows[:whole])
+            level.write(new_rows)
+            k += 1
+
+    def array(self):
+        # Every (time, value) row, as a read only memory map
+        with self.lock:
+            return self.levels[0].read()
+
+    def tail(self, k):
+        # Rows still in partial blocks at or below level k, each summarised as one row, oldest first
+        rows = []
+        with self.lock:
+            for level in self.levels[k:0:-1]:
+                if len(level.partial):
+                    partial = level.partial
+                    rows.append((partial[0, 0], partial[-1, 1], partial[:, 2].min(), partial[:, 3].max()))
+        return np.array(rows).reshape(-1, 4)
+
+    def decimate(self, x_start, x_end, pixels):
+        # (x, y) to draw for times between x_start and x_end, at most four points per pixel
+        with self.lock:
+            return self.decimate_locked(x_start, x_end, pixels)
+
+    def decimate_locked(self, x_start, x_end, pixels):
+        times = self.levels[0].read()[:, 0]
+        start = np.searchsorted(times, x_start, "left")
+        end = np.searchsorted(times, x_end, "right")
+
+        if end - start <= 2 * pixels:
+            samples = self.levels[0].read()[start:end]
+            return samples[:, 0], samples[:, 1]
+
+        # The level with at most two rows per pixel
+        k = min(len(self.levels) - 1, math.ceil(math.log((end - start) / (2 * pixels), FANOUT)))
+        rows = self.levels[k].read()
+        start = np.searchsorted(rows[:, 1], x_start, "left")
+        end = np.searchsorted(rows[:, 0], x_end, "right")
+
+        tail = self.tail(k)
+        tail = tail[(tail[:, 1] >= x_start) & (tail[:, 0] <= x_end)]
+        rows = np.concatenate((rows[start:end], tail))
+
+        # Each row is drawn from its minimum at its first time to its maximum at its last
+        x = np.empty(2 * len(rows))
+        y = np.empty(2 * len(rows))
+        x[0::2] = rows[:, 0]
+        x[1::2] = rows[:, 1]
+        y[0::2] = rows[:, 2]
+        y[1::2] = rows[:, 3]
+
+        # Rows straddling the edges of the view are cut to it
+        x = np.clip(x, x_start, x_end)
+        return min_max_decimate(x, y, x_start, x_end, pixels)
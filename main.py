@@ -1,54 +1,109 @@
 import pygame
 import sys
 import math
+import queue
+import argparse
+import threading
+import numpy as np
 from time import perf_counter
+from collections import OrderedDict, namedtuple
+
+from physics import InterferometerEngine, arm_path_distance, end_phase, white_light_spectrum
+from optics import CavityEngine
+from colour import wavelength_colour, wavelength_colours, spectrum_colour, scale_colour
+from strain import SinusoidalStrain, StrainStream, apply_strain
+from buffers import RingBuffer, min_max_decimate
+from history import PyramidHistory
+from recorder import DataRecorder
+from scheduler import FixedStepScheduler
+from profiler import StageProfiler
+from spectral import WelchEstimator
+from noise import DisplacementNoise
+from session import SessionWriter
+from network import random_network
+from fringes import FringePattern
 
 WIDTH = 800
 HEIGHT = 800
-WIN = pygame.display.set_mode((WIDTH, HEIGHT))
 
-pygame.init()
-
-font = pygame.font.SysFont("calibri", 20)
+# Importing this module does no work, the window and fonts are only made when
+# first needed and the GUI only starts from main(), so the classes can be used
+# from scripts and worker processes without touching SDL
+WIN = None
+
+def window():
+    global WIN
+    if WIN is None:
+        pygame.init()
+        WIN = pygame.display.set_mode((WIDTH, HEIGHT))
+    return WIN
+
+# SysFont scans every installed font, so each lookup is only done once
+font_cache = {}
+
+def get_font(name="calibri", size=20):
+    font = font_cache.get((name, size))
+    if font is None:
+        pygame.font.init()
+        font = pygame.font.SysFont(name, size)
+        font_cache[(name, size)] = font
+    return font
 
 def dist_to(pos1, pos2):
     return ((pos2[0] - pos1[0])**2 + (pos2[1] - pos1[1])**2)**0.5
 
+text_cache = OrderedDict()
+TEXT_CACHE_SIZE = 256
+
+def render_text(text, colour=(255, 255, 255), antialias=True):
+    # font.render is slow, so rendered text is kept in a small LRU cache
+    key = (text, colour, antialias)
+    text_surface = text_cache.get(key)
+    if text_surface is None:
+        text_surface = get_font().render(text, antialias, colour)
+        text_cache[key] = text_surface
+        if len(text_cache) > TEXT_CACHE_SIZE:
+            text_cache.popitem(last=False)
+    else:
+        text_cache.move_to_end(key)
+
+    return text_surface
+
+def latest(values):
+    # Last value of a scalar or an array of samples as a float
+    return float(np.ravel(values)[-1])
+
 
 
-def wavelength_to_colour(wavelength, amplitude):
-    if realistic:
-        amplitude = 1
-    if wavelength >= 380 and wavelength <= 460:
-        R = (460 - wavelength) / (460 - 380)
-        G = 0
-        B = 1
-    elif wavelength >= 460 and wavelength <= 510:
-        R = 0
-        G = (wavelength - 460) / (510 - 460)
-        B = 1
-    elif wavelength >= 510 and wavelength <= 550:
-        R = 0
-        G = 1
-        B = (550 - wavelength) / (550 - 510)
-    elif wavelength >= 550 and wavelength <= 600:
-        R = (wavelength - 550) / (600 - 550)
-        G = 1
-        B = 0
-    elif wavelength >= 600 and wavelength <= 700:
-        R = 1
-        G = (700 - wavelength) / (700 - 600)
-        B = 0
-    elif wavelength == 1064:
-        R = 1
-        G = 0
-        B = 0
+rotation_cache = OrderedDict()
+ROTATION_CACHE_SIZE = 32
+
+def rotate_cached(surface, angle):
+    # pygame.transform.rotate allocates a new surface, so results are kept in a small LRU cache
+    key = (surface, angle)
+    rotated = rotation_cache.get(key)
+    if rotated is None:
+        rotated = pygame.transform.rotate(surface, angle)
+        rotation_cache[key] = rotated
+        if len(rotation_cache) > ROTATION_CACHE_SIZE:
+            rotation_cache.popitem(last=False)
     else:
-        R = 1
-        G = 1
-        B = 1
-    
-    return (int(R * 255 * min(1, amplitude)), int(G * 255 * min(1, amplitude)), int(B * 255 * min(1, amplitude)))
+        rotation_cache.move_to_end(key)
+
+    return rotated
+
+def forget_rotations(surface):
+    for key in [key for key in rotation_cache if key[0] is surface]:
+        del rotation_cache[key]
+
+
+
+def take_fields(obj, names):
+    return tuple(getattr(obj, name) for name in names)
+
+def set_fields(obj, names, values):
+    for name, value in zip(names, values):
+        setattr(obj, name, value)
 
 
 
@@ -61,25 +116,50 @@ class RotatedRectangle():
         self.rotation = rotation
         self.colour = colour
         
-        self.original_image = pygame.Surface((self.width, self.height))
-        self.original_image.set_colorkey((0, 0, 0)) # for making transparent background while rotating an image
-        self.original_image.fill(self.colour)
+        self.original_image = self.create_image()
+        self.drawn_rotation = rotation
 
         self.rect = self.original_image.get_rect()
         self.rect.center = self.pos
 
+    def create_image(self):
+        image = pygame.Surface((self.width, self.height))
+        image.set_colorkey((0, 0, 0)) # for making transparent background while rotating an image
+        image.fill(self.colour)
+        return image
+
+    def set_rotation(self, rotation):
+        # Can be called from the simulation thread, so the rotation cache is left to the drawing side
+        self.rotation = rotation
+
+    def rotated_image(self):
+        # Cached rotations of the old angle are dropped once the rectangle has turned
+        if self.rotation != self.drawn_rotation:
+            forget_rotations(self.original_image)
+            self.drawn_rotation = self.rotation
+        return rotate_cached(self.original_image, self.rotation)
+
     def draw(self):
         if self.rotation != 0:
             old_center = self.rect.center
 
-            new_image = pygame.transform.rotate(self.original_image, self.rotation)
+            new_image = self.rotated_image()
 
             rect = new_image.get_rect()
             rect.center = old_center
 
-            WIN.blit(new_image, rect)
+            window().blit(new_image, rect)
+        else:
+            window().blit(self.original_image, self.rect)
+
+    def dirty_parts(self):
+        # (state, screen rect) pairs used by DirtyRenderer
+        if self.rotation != 0:
+            rect = self.rotated_image().get_rect(center=self.rect.center)
         else:
-            WIN.blit(self.original_image, self.rect)
+            rect = self.rect.copy()
+
+        return [((self.rect.center, self.rotation, self.colour), rect)]
 
 
 
@@ -105,20 +185,40 @@ class Toggle():
 
     def draw(self):
         # Draw background rectangle
-        pygame.draw.rect(WIN, self.box_colour, (self.pos[0] - self.width/2, self.pos[1] - self.height/2, self.width, self.height), 2)
+        pygame.draw.rect(window(), self.box_colour, (self.pos[0] - self.width/2, self.pos[1] - self.height/2, self.width, self.height), 2)
 
         # Draw toggle
         if self.condition:
-            pygame.draw.rect(WIN, (0, 255, 0), (self.pos[0] - self.width/2 + self.toggle_offset, self.pos[1] - self.height/2 + self.toggle_offset, self.width - 2*self.toggle_offset, self.height - 2*self.toggle_offset))
+            pygame.draw.rect(window(), (0, 255, 0), (self.pos[0] - self.width/2 + self.toggle_offset, self.pos[1] - self.height/2 + self.toggle_offset, self.width - 2*self.toggle_offset, self.height - 2*self.toggle_offset))
 
         # Draw toggle text
-        text_surface = font.render(self.text, True, (255, 255, 255))
-        WIN.blit(text_surface, (self.pos[0] + self.width, self.pos[1] - text_surface.get_height()/2))
+        text_surface = render_text(self.text)
+        window().blit(text_surface, (self.pos[0] + self.width, self.pos[1] - text_surface.get_height()/2))
+
+    def dirty_parts(self):
+        text_surface = render_text(self.text)
+        box = pygame.Rect(self.pos[0] - self.width/2, self.pos[1] - self.height/2, self.width, self.height)
+        text = text_surface.get_rect(topleft=(self.pos[0] + self.width, self.pos[1] - text_surface.get_height()/2))
+
+        return [((self.condition, self.text), box.union(text))]
+
+
+
+class Label():
+    def __init__(self, pos, text) -> None:
+        self.pos = pos
+        self.text = text
+
+    def draw(self):
+        window().blit(render_text(self.text), self.pos)
+
+    def dirty_parts(self):
+        return [(self.text, render_text(self.text).get_rect(topleft=self.pos))]
 
 
 
 class Graph():
-    def __init__(self, pos, width, height, colour, x_start, x_end, y_start, y_end) -> None:
+    def __init__(self, pos, width, height, colour, x_start, x_end, y_start, y_end, points=None) -> None:
         self.pos = pos
         self.width = width
         self.height = height
@@ -143,7 +243,13 @@ class Graph():
         self.x_coord_range = self.end_x_coords[0] - self.start_x_coords[0]
         self.y_coord_range = self.end_y_coords[1] - self.start_y_coords[1]
 
-        self.points = []
+        # Rows of (time, value), kept in files on disk unless another store is given
+        self.points = PyramidHistory() if points is None else points
+        self.revision = 0 # bumped when points are replaced rather than appended
+        self.line_key = None
+        self.line = []
+
+        self.visible = True
 
         self.text_offset = 5
 
@@ -155,16 +261,31 @@ class Graph():
 
         self.is_graphing_colour = (255, 0, 0)
 
+        # Off-screen layer the size of the graph holding its background, axes and grid
+        self.chrome = pygame.Surface(self.rect().size)
+        self.chrome_rect = None
+        self.chrome_key_drawn = None
+
+        self.labels = [] # (text surface, position) pairs drawn over the chrome
+        self.labels_key = None
+
         self.graph_timer = 0
         self.graph_time = 0.1
         self.graph_total_time = 0
 
+        # Zoom and pan, the view follows the newest samples until it is moved back
+        self.x_origin = x_start
+        self.min_x_range = 10 * self.graph_time
+        self.view_range = None # None shows the whole history
+        self.following = True
+        self.pan_start = None
+
     def point_to_position(self, point):
 
-        x_proportion = point[0] / self.x_range
+        x_proportion = (point[0] - self.x_start) / self.x_range
         new_x = x_proportion * self.x_coord_range
 
-        y_proportion = point[1] / self.y_range
+        y_proportion = (point[1] - self.y_start) / self.y_range
         new_y = y_proportion * self.y_coord_range
 
         return (self.start_x_coords[0] + new_x, self.start_y_coords[1] + new_y)
@@ -172,97 +293,471 @@ class Graph():
     def add_point(self, point):
         self.points.append(point)
 
-    def draw_axis_info(self):
-        # Draw x-axis labels
-        axis_x_start = font.render(f"{self.x_start}", True, (255, 255, 255))
-        WIN.blit(axis_x_start, (self.start_x_coords[0] - axis_x_start.get_width()/2, self.start_x_coords[1] + self.text_offset))
+    # The view, the points themselves are shared with the drawing thread's copy
+    snapshot_fields = ("x_start", "x_end", "x_range", "y_start", "y_end", "y_range", "revision", "visible", "is_graphing_colour")
 
-        axis_x_end = font.render(f"{round(self.x_end, 2)}", True, (255, 255, 255))
-        WIN.blit(axis_x_end, (self.end_x_coords[0] - axis_x_end.get_width()/2, self.end_x_coords[1] + self.text_offset))
+    def snapshot(self):
+        return take_fields(self, self.snapshot_fields)
 
-        # Draw y-axis labels
-        axis_y_start = font.render(f"{self.y_start}", True, (255, 255, 255))
-        WIN.blit(axis_y_start, (self.start_y_coords[0] - axis_y_start.get_width() - self.text_offset, self.start_y_coords[1] - axis_y_start.get_height()/2))
+    def apply_snapshot(self, state):
+        set_fields(self, self.snapshot_fields, state)
 
-        axis_y_end = font.render(f"{round(self.y_end, 2)}", True, (255, 255, 255))
-        WIN.blit(axis_y_end, (self.end_y_coords[0] - axis_y_end.get_width() - self.text_offset, self.end_y_coords[1]))
+    def rect(self):
+        return pygame.Rect(self.pos[0] - self.width/2, self.pos[1] - self.height/2, self.width, self.height)
 
-        # Draw x-axis Title
-        axis_x_title = font.render(self.x_axis_title, True, (255, 255, 255))
-        WIN.blit(axis_x_title, (self.pos[0] - axis_x_title.get_width()/2, self.start_x_coords[1] + self.text_offset))
+    def position_to_x(self, position):
+        return self.x_start + (position[0] - self.start_x_coords[0]) / self.x_coord_range * self.x_range
 
-        # Draw y-axis Title
-        axis_y_title = font.render(self.y_axis_title, True, (255, 255, 255))
+    def update_view(self):
+        if self.following:
+            if self.view_range is None:
+                self.x_start = self.x_origin
+                self.x_end = max(30, self.graph_total_time)
+            else:
+                self.x_end = max(self.x_origin + self.view_range, self.graph_total_time)
+                self.x_start = self.x_end - self.view_range
+
+        self.x_range = self.x_end - self.x_start
+
+    def set_view(self, x_start, x_end):
+        # Kept inside the history, reaching its newest end follows it again
+        history_end = max(30, self.graph_total_time)
+        x_range = min(x_end - x_start, history_end - self.x_origin)
+        x_start = min(max(x_start, self.x_origin), history_end - x_range)
+
+        self.view_range = None if x_range >= history_end - self.x_origin else x_range
+        self.following = x_start + x_range >= history_end
+
+        self.x_start = x_start
+        self.x_end = x_start + x_range
+        self.update_view()
+
+    def reset_view(self):
+        self.view_range = None
+        self.following = True
+        self.pan_start = None
+        self.update_view()
+
+    def zoom(self, position, steps):
+        # Mouse wheel steps, positive zooms in around the time under the cursor
+        x = self.position_to_x(position)
+        x_range = max(self.min_x_range, self.x_range * 0.8**steps)
+        x_start = x - (x - self.x_start) * x_range / self.x_range
+        self.set_view(x_start, x_start + x_range)
+
+    def start_pan(self, position):
+        self.pan_start = (position[0], self.x_start, self.x_end)
+
+    def pan(self, position):
+        if self.pan_start is None:
+            return
+
+        mouse_x, x_start, x_end = self.pan_start
+        shift = (mouse_x - position[0]) / self.x_coord_range * (x_end - x_start)
+        self.set_view(x_start + shift, x_end + shift)
+
+    def stop_pan(self):
+        self.pan_start = None
+
+    def line_data(self, pixels):
+        # Only the level of the history matching the plot width is read
+        return self.points.decimate(self.x_start, self.x_end, pixels)
+
+    def line_positions(self):
+        # Screen positions of the points, decimated to the plot width in pixels
+        line_key = (len(self.points), self.revision, self.x_start, self.x_range, self.y_start, self.y_range)
+        if line_key == self.line_key:
+            return self.line
+        self.line_key = line_key
+
+        x, y = self.line_data(max(1, int(self.x_coord_range)))
+        x, y = self.point_to_position((x, y))
+
+        positions = np.empty((len(x), 2))
+        positions[:, 0] = x
+        positions[:, 1] = y
+        self.line = positions.tolist()
+        return self.line
+
+    def label_texts(self):
+        return (f"{round(self.x_start, 2)}", f"{round(self.x_end, 2)}", f"{self.y_start}", f"{round(self.y_end, 2)}", self.x_axis_title, self.y_axis_title)
+
+    def update_labels(self):
+        # Axis labels and titles with where they go, only rendered again when their text changes
+        texts = self.label_texts()
+        if texts == self.labels_key:
+            return
+
+        axis_x_start, axis_x_end, axis_y_start, axis_y_end, axis_x_title, axis_y_title = (render_text(text) for text in texts)
         axis_y_title = pygame.transform.rotate(axis_y_title, 90)
-        WIN.blit(axis_y_title, (self.start_y_coords[0] - axis_y_title.get_width()/2 - self.text_offset - 5, self.pos[1] - axis_y_title.get_height()/2))
+
+        self.labels = [
+            (axis_x_start, (self.start_x_coords[0] - axis_x_start.get_width()/2, self.start_x_coords[1] + self.text_offset)),
+            (axis_x_end, (self.end_x_coords[0] - axis_x_end.get_width()/2, self.end_x_coords[1] + self.text_offset)),
+            (axis_y_start, (self.start_y_coords[0] - axis_y_start.get_width() - self.text_offset, self.start_y_coords[1] - axis_y_start.get_height()/2)),
+            (axis_y_end, (self.end_y_coords[0] - axis_y_end.get_width() - self.text_offset, self.end_y_coords[1])),
+            (axis_x_title, (self.pos[0] - axis_x_title.get_width()/2, self.start_x_coords[1] + self.text_offset)),
+            (axis_y_title, (self.start_y_coords[0] - axis_y_title.get_width()/2 - self.text_offset - 5, self.pos[1] - axis_y_title.get_height()/2)),
+        ]
+        self.labels_key = texts
+
+        # Labels can reach past the graph's edges
+        self.chrome_rect = self.rect().unionall([text.get_rect(topleft=position) for text, position in self.labels])
 
     def update(self, delta_time, graphing, y_input):
         if graphing:
             self.is_graphing_colour = (0, 255, 0)
-            if self.graph_timer < self.graph_time:
-                self.graph_timer += delta_time
-                self.graph_total_time += delta_time
-            else:
+            self.graph_timer += delta_time
+            self.graph_total_time += delta_time
+
+            # Carrying the remainder over keeps samples exactly graph_time apart
+            if self.graph_timer >= self.graph_time:
                 self.add_point((self.graph_total_time, y_input))
-                self.graph_timer = 0
+                self.graph_timer -= self.graph_time
 
-            self.x_end = max(30, self.graph_total_time)
-            self.x_range = self.x_end - self.x_start
+            self.update_view()
 
             self.y_end = max(self.y_end, y_input)
             self.y_range = self.y_end - self.y_start
         else:
             self.is_graphing_colour = (255, 0, 0)
 
-    def draw(self):
+    def chrome_key(self):
+        # Everything the static layer depends on
+        while self.x_range / self.x_axis_grid_separation > 20:
+            self.x_axis_grid_separation *= 2
+        while self.x_range / self.x_axis_grid_separation < 5:
+            self.x_axis_grid_separation /= 2
+
+        return (self.x_start, self.x_end, self.y_start, self.y_end, self.x_axis_grid_separation, self.y_axis_grid_separation)
+
+    def chrome_position(self, position):
+        # Window coordinates to coordinates on the chrome surface
+        left, top = self.rect().topleft
+        return (position[0] - left, position[1] - top)
+
+    def draw_chrome(self, surface):
         # Draws background
-        pygame.draw.rect(WIN, self.colour, (self.pos[0] - self.width/2, self.pos[1] - self.height/2, self.width, self.height))
+        surface.fill(self.colour)
 
         # X-axis
-        pygame.draw.line(WIN, (255, 255, 255), self.start_x_coords, self.end_x_coords)
+        pygame.draw.line(surface, (255, 255, 255), self.chrome_position(self.start_x_coords), self.chrome_position(self.end_x_coords))
 
         # Y-axis
-        pygame.draw.line(WIN, (255, 255, 255), self.start_y_coords, self.end_y_coords)
+        pygame.draw.line(surface, (255, 255, 255), self.chrome_position(self.start_y_coords), self.chrome_position(self.end_y_coords))
 
 
-        # Draw grid
-        num_x_lines = self.x_range / self.x_axis_grid_separation
-        if num_x_lines > 20:
-            self.x_axis_grid_separation *= 2
-            num_x_lines = self.x_range / self.x_axis_grid_separation
-        
-        for x in range(int(num_x_lines)):
-            pygame.draw.line(WIN, (100, 100, 100), (self.start_y_coords[0] + (x+1)/(self.x_range / self.x_axis_grid_separation) * self.x_coord_range, self.start_y_coords[1]), (self.end_y_coords[0] + (x+1)/(self.x_range / self.x_axis_grid_separation) * self.x_coord_range, self.end_y_coords[1]))
-        
+        # Draw grid, vertical lines sit on multiples of the separation so they move with the view
+        separation = self.x_axis_grid_separation
+        start_y = self.chrome_position(self.start_y_coords)
+        end_y = self.chrome_position(self.end_y_coords)
+
+        for n in range(math.floor(self.x_start / separation) + 1, math.floor(self.x_end / separation) + 1):
+            x = (n * separation - self.x_start) / self.x_range * self.x_coord_range
+            pygame.draw.line(surface, (100, 100, 100), (start_y[0] + x, start_y[1]), (end_y[0] + x, end_y[1]))
+
+        start_x = self.chrome_position(self.start_x_coords)
+        end_x = self.chrome_position(self.end_x_coords)
+
         for y in range(int(self.y_range / self.y_axis_grid_separation)):
-            pygame.draw.line(WIN, (100, 100, 100), (self.start_x_coords[0], self.start_x_coords[1] + (y+1)/(self.y_range / self.y_axis_grid_separation) * self.y_coord_range), (self.end_x_coords[0], self.end_x_coords[1] + (y+1)/(self.y_range / self.y_axis_grid_separation) * self.y_coord_range))
+            pygame.draw.line(surface, (100, 100, 100), (start_x[0], start_x[1] + (y+1)/(self.y_range / self.y_axis_grid_separation) * self.y_coord_range), (end_x[0], end_x[1] + (y+1)/(self.y_range / self.y_axis_grid_separation) * self.y_coord_range))
+
+    def update_chrome(self):
+        # Background, axes and grid are only redrawn when the view changes, and the labels when their text does
+        chrome_key = self.chrome_key()
+        if chrome_key != self.chrome_key_drawn:
+            self.draw_chrome(self.chrome)
+            self.chrome_key_drawn = chrome_key
+
+        self.update_labels()
+
+    def showing_last_point(self):
+        return len(self.points) > 1 and self.x_start <= self.points[-1][0] <= self.x_end
+
+    def info_text_rect(self):
+        # Where the value of the last point is written
+        last_point = self.points[-1]
+        info_text = render_text(f"{round(last_point[1], 2)}")
+        position = self.point_to_position(last_point)
+
+        return info_text.get_rect(topleft=(position[0] + info_text.get_width()/2, position[1] - info_text.get_height()/2))
+
+    def dirty_parts(self):
+        self.update_chrome()
+        if not self.visible:
+            return [(None, self.chrome_rect)]
+
+        rect = self.chrome_rect
+        last_point = None
+        if self.showing_last_point():
+            rect = rect.union(self.info_text_rect())
+            last_point = self.points[-1]
+
+        return [((self.chrome_key_drawn, self.labels_key, len(self.points), self.revision, last_point, self.is_graphing_colour), rect)]
+
+    def draw(self):
+        if not self.visible:
+            return
+
+        self.update_chrome()
+        window().blit(self.chrome, self.rect())
+        window().blits(self.labels, doreturn=False)
 
-        
         # Draw is graphing circle
-        pygame.draw.circle(WIN, self.is_graphing_colour, (self.pos[0] + self.width/2 - 7, self.pos[1] - self.height/2 + 7), 7)
+        pygame.draw.circle(window(), self.is_graphing_colour, (self.pos[0] + self.width/2 - 7, self.pos[1] - self.height/2 + 7), 7)
         
 
         # Draws points
-        if len(self.points) > 1:
-
-            # Remove close points to improve performance
-            if dist_to(self.point_to_position(self.points[len(self.points)-1]), self.point_to_position(self.points[len(self.points)-2])) < 1:
-                self.points.remove(self.points[len(self.points)-1])
-
-            for i in range(len(self.points) - 1):
-                pygame.draw.line(WIN, (100, 100, 255), self.point_to_position(self.points[i]), self.point_to_position(self.points[i+1]), 2)
+        line = self.line_positions()
+        if len(line) > 1:
+            pygame.draw.lines(window(), (100, 100, 255), False, line, 2)
 
+        if self.showing_last_point():
             # Draws info on last point
-            info_text = font.render(f"{round(self.points[len(self.points)-1][1], 2)}", True, (255, 255, 255))
-            WIN.blit(info_text, (self.point_to_position(self.points[len(self.points)-1])[0] + info_text.get_width()/2, self.point_to_position(self.points[len(self.points)-1])[1] - info_text.get_height()/2))
+            info_text = render_text(f"{round(self.points[-1][1], 2)}")
+            window().blit(info_text, self.info_text_rect())
         
         #for point in self.points:
-            #pygame.draw.circle(WIN, (255, 255, 255), self.point_to_position(point), 5)
+            #pygame.draw.circle(window(), (255, 255, 255), self.point_to_position(point), 5)
+
 
-        # Draws axis
-        self.draw_axis_info()
 
+class SpectrumGraph(Graph):
+    # Live amplitude spectral density of the detector intensity, as log10 of the ASD
+    def __init__(self, pos, width, height, colour, estimator, refresh_time=0.5) -> None:
+        nyquist = estimator.sample_rate / 2
+        super().__init__(pos, width, height, colour, x_start=0, x_end=nyquist, y_start=-6, y_end=0, points=RingBuffer(2))
 
+        self.estimator = estimator
+
+        self.x_axis_title = "Frequency/Hz"
+        self.y_axis_title = "log10 ASD"
+
+        self.x_axis_grid_separation = nyquist / 10
+        self.y_axis_grid_separation = 1
+
+        self.refresh_time = refresh_time
+        self.refresh_timer = 0
+
+        self.visible = False
+
+        # Copy of the points for snapshots, only remade when they change
+        self.snapshot_points = (self.revision, self.points.array().copy())
+
+    def snapshot(self):
+        if self.snapshot_points[0] != self.revision:
+            self.snapshot_points = (self.revision, self.points.array().copy())
+        return super().snapshot() + (self.snapshot_points[1],)
+
+    def apply_snapshot(self, state):
+        revision = self.revision
+        super().apply_snapshot(state[:-1])
+        if self.revision != revision:
+            self.points.clear()
+            self.points.extend(state[-1])
+
+    def line_data(self, pixels):
+        samples = self.points.array()
+        return min_max_decimate(samples[:, 0], samples[:, 1], self.x_start, self.x_end, pixels)
+
+    def update(self, delta_time, samples):
+        # Samples are always analysed, the plot is refreshed a few times a second
+        self.estimator.push(samples)
+
+        self.refresh_timer += delta_time
+        if self.refresh_timer >= self.refresh_time and self.estimator.segments:
+            self.refresh_timer = 0
+            self.is_graphing_colour = (0, 255, 0)
+
+            log_asd = np.log10(np.maximum(self.estimator.asd(), 1e-12))
+            self.points.clear()
+            self.points.extend(np.column_stack((self.estimator.frequencies, log_asd)))
+            self.revision += 1
+
+            # Whole decades that fit the spectrum, leaving out the DC bin
+            self.y_start = math.floor(log_asd[1:].min())
+            self.y_end = max(self.y_start + 1, math.ceil(log_asd.max()))
+            self.y_range = self.y_end - self.y_start
+
+    def reset(self):
+        self.estimator.reset()
+        self.points.clear()
+        self.revision += 1
+        self.is_graphing_colour = (255, 0, 0)
+
+
+
+class NetworkView():
+    # Recent output of every detector in a DetectorNetwork as a grid of tiles, each
+    # tinted by its wavelength and brightness. All tiles are drawn at once, the
+    # backgrounds by scaling up a surface with a pixel per tile and the traces by
+    # writing straight into the pixels, so hundreds of detectors cost about the same as a few.
+    def __init__(self, pos, width, height, network, sample_time=0.02) -> None:
+        self.rect = pygame.Rect(pos[0] - width/2, pos[1] - height/2, width, height)
+        self.network = network
+        n_detectors = len(network)
+
+        self.columns = math.ceil(math.sqrt(n_detectors * width / height))
+        self.rows = math.ceil(n_detectors / self.columns)
+        self.tile_width = int(width // self.columns)
+        self.tile_height = int(height // self.rows)
+
+        tiles = np.arange(n_detectors)
+        self.tile_x = (tiles % self.columns) * self.tile_width
+        self.tile_y = (tiles // self.columns) * self.tile_height
+
+        self.colours = wavelength_colours(network.engine.wavelength * np.ones(n_detectors)) * 255
+        self.trace_colours = np.minimum(self.colours + 80, 255).astype(np.uint8)
+
+        # Rows of every detector's intensity, sampled every sample_time seconds, one per pixel across a tile
+        self.sample_time = sample_time
+        self.history = RingBuffer(n_detectors, max(2, self.tile_width - 3), grow=False)
+        self.last_sample = -1
+        self.revision = 0
+
+        self.tiles = pygame.Surface((self.columns, self.rows))
+        self.surface = pygame.Surface((self.columns * self.tile_width, self.rows * self.tile_height))
+        self.drawn_revision = None
+
+        self.visible = False
+
+        # Copy of the history for snapshots, only remade when it changes
+        self.snapshot_history = (self.revision, self.history.array().copy())
+
+    def update(self, times, distorting):
+        # times are the physics step times of the frame, the network is evaluated at the sample times among them
+        if not self.visible or len(times) == 0:
+            return
+
+        samples = np.floor(times / self.sample_time)
+        new = np.flatnonzero(np.diff(samples, prepend=self.last_sample) > 0)
+        if len(new) == 0:
+            return
+        self.last_sample = samples[-1]
+
+        self.history.extend(self.network.evaluate(times[new], distorting).intensity)
+        self.revision += 1
+
+    def reset(self):
+        self.history.clear()
+        self.last_sample = -1
+        self.revision += 1
+
+    def render(self):
+        values = self.history.array()
+        level = np.clip(values / (2 * self.network.engine.amplitude), 0, 1)
+        latest = level[-1] if len(level) else np.zeros(len(self.network))
+
+        # Tile backgrounds from the latest output, laid out row by row
+        tiles = np.zeros((self.rows * self.columns, 3))
+        tiles[:len(latest)] = self.colours * (0.1 + 0.3 * latest[:, None])
+        pygame.surfarray.blit_array(self.tiles, tiles.astype(np.uint8).reshape(self.rows, self.columns, 3).transpose(1, 0, 2))
+        pygame.transform.scale(self.tiles, self.surface.get_size(), self.surface)
+
+        pixels = pygame.surfarray.pixels3d(self.surface)
+
+        # Traces, newest sample at the right edge of each tile
+        x = 1 + np.arange(self.history.capacity - len(level), self.history.capacity)
+        y = 1 + ((1 - level) * (self.tile_height - 3)).astype(np.int64)
+        pixels[self.tile_x + x[:, None], self.tile_y + y] = self.trace_colours
+
+        # Gaps between the tiles
+        pixels[::self.tile_width] = 0
+        pixels[:, ::self.tile_height] = 0
+
+        # The surface stays locked while the pixel array exists
+        del pixels
+        self.drawn_revision = self.revision
+
+    snapshot_fields = ("visible", "revision")
+
+    def snapshot(self):
+        if self.snapshot_history[0] != self.revision:
+            self.snapshot_history = (self.revision, self.history.array().copy())
+        return take_fields(self, self.snapshot_fields) + (self.snapshot_history[1],)
+
+    def apply_snapshot(self, state):
+        revision = self.revision
+        set_fields(self, self.snapshot_fields, state[:-1])
+        if self.revision != revision:
+            self.history.clear()
+            self.history.extend(state[-1])
+
+    def dirty_parts(self):
+        if not self.visible:
+            return [(None, self.rect)]
+        return [((self.revision, len(self.network)), self.rect)]
+
+    def draw(self):
+        if not self.visible:
+            return
+
+        if self.drawn_revision != self.revision:
+            self.render()
+        window().blit(self.surface, self.rect)
+        window().blit(render_text(f"{len(self.network)} detectors"), (self.rect.x + 5, self.rect.y + 5))
+
+
+
+DETECTOR_SCREEN_RESOLUTION = 320 # pixels a side, sized to fit beside the interferometer
+
+class DetectorScreen():
+    # The fringe pattern a screen at the detector would show, from the arm paths and
+    # mirror tilts. The surface is 8 bit with a palette ramping to the laser colour, and
+    # FringePattern's pixel values are cast straight into its pixel buffer, so a frame is
+    # one small matrix product and one copy however big the screen is.
+    def __init__(self, pos, resolution) -> None:
+        self.rect = pygame.Rect(pos[0], pos[1], resolution, resolution)
+        self.pattern = FringePattern(resolution)
+
+        self.surface = pygame.Surface((resolution, resolution), depth=8)
+        self.palette_colour = None
+        self.drawn_key = None
+
+        self.visible = False
+
+    def key(self, interferometer):
+        return (interferometer.top_path, interferometer.right_path, interferometer.top_mirror.tilt, interferometer.right_mirror.tilt, interferometer.wavelength, interferometer.laser_emitted.base_colour)
+
+    def render(self, interferometer):
+        colour = interferometer.laser_emitted.base_colour
+        if colour != self.palette_colour:
+            self.surface.set_palette([scale_colour(colour, level / 255) for level in range(256)])
+            self.palette_colour = colour
+
+        # The half added rounds instead of truncating and keeps float error from wrapping below zero
+        image = self.pattern.evaluate(interferometer.top_path, interferometer.right_path, interferometer.top_mirror.tilt, interferometer.right_mirror.tilt, interferometer.wavelength, scale=255, offset=0.5)
+
+        # The surface stays locked while the pixel array exists
+        pixels = pygame.surfarray.pixels2d(self.surface)
+        np.copyto(pixels, image, casting="unsafe")
+        del pixels
+
+    def dirty_parts(self, interferometer):
+        if not self.visible:
+            return [(None, self.rect)]
+        return [(self.key(interferometer), self.rect)]
+
+    def draw(self, interferometer):
+        if not self.visible:
+            return
+
+        key = self.key(interferometer)
+        if key != self.drawn_key:
+            self.render(interferometer)
+            self.drawn_key = key
+
+        window().blit(self.surface, self.rect)
+        pygame.draw.rect(window(), (255, 255, 255), self.rect, 1)
+        window().blit(render_text("Detector screen"), (self.rect.x + 5, self.rect.y + 5))
+
+
+
+# Mirror tilt is dragged with the right mouse button along the mirror, and drawn
+# hugely exaggerated so a fraction of a milliradian is visible
+MAX_TILT = 1e-3 # radians
+TILT_PER_PIXEL = 1e-5
+TILT_DISPLAY_SCALE = 200
 
 class Mirror(RotatedRectangle):
     def __init__(self, pos, width, height, rotation, colour, drag_axis, min_pos, max_pos) -> None:
@@ -275,38 +770,98 @@ class Mirror(RotatedRectangle):
         self.min_pos = min_pos
         self.max_pos = max_pos
 
-        self.time_distorting = 0
+        self.previous_pos = self.pos
 
-        if self.drag_axis == 0:
-            self.path_distance = self.pos[0] - WIDTH/2
-        else:
-            self.path_distance = HEIGHT/2 - self.pos[1]
+        # Tilt in radians in the plane of the table, only the detector screen sees it
+        self.tilt = 0
+        self.tilting = False
+        self.tilt_start = (0, 0) # mouse coordinate along the mirror and tilt when tilting started
+        self.base_rotation = rotation
+
+        # Optional DisplacementNoise added to the path length
+        self.noise = None
+        self.noise_offset = 0
+
+        self.update_path_distance()
+
+    # What drawing needs, copied across in threaded mode
+    snapshot_fields = ("pos", "previous_pos", "tilt", "rotation")
+
+    def snapshot(self):
+        return take_fields(self, self.snapshot_fields)
+
+    def apply_snapshot(self, state):
+        set_fields(self, self.snapshot_fields, state)
 
     def update_pos(self, pos):
         self.pos = pos
         self.rect.center = pos
 
-    def update(self, delta_time, mouse, distorting):
-        if distorting:
-            if self.drag_axis == 0:
-                self.update_pos((self.pos[0] + math.cos(self.time_distorting) * delta_time * 1e-10, self.pos[1]))
+    def update_path_distance(self):
+        if self.drag_axis == 0:
+            self.path_distance = float(arm_path_distance(self.pos[0], WIDTH/2, 0)) + self.noise_offset
+        else:
+            self.path_distance = float(arm_path_distance(self.pos[1], HEIGHT/2, 1)) + self.noise_offset
 
+    def set_tilt(self, tilt):
+        self.tilt = min(MAX_TILT, max(-MAX_TILT, tilt))
+        self.set_rotation(self.base_rotation - round(math.degrees(self.tilt) * TILT_DISPLAY_SCALE))
+
+    def start_tilt(self, mouse):
+        # Tilting follows the mouse along the length of the mirror, across its drag axis
+        self.tilting = True
+        self.tilt_start = (mouse[1 - self.drag_axis], self.tilt)
+
+    def interpolated_pos(self, alpha):
+        return (self.previous_pos[0] + (self.pos[0] - self.previous_pos[0]) * alpha, self.previous_pos[1] + (self.pos[1] - self.previous_pos[1]) * alpha)
+
+    def follow(self, mouse, distorting):
+        # While distorting the strain stream moves the mirrors, see Interferometer.update
+        if not distorting and self.drag:
+            if self.drag_axis == 0:
+                self.update_pos((min(self.max_pos, max(self.min_pos, mouse[0] + self.drag_offset[0])), self.pos[1]))
             else:
-                self.update_pos((self.pos[0], self.pos[1] + math.cos(self.time_distorting) * delta_time * 1e-10))
+                self.update_pos((self.pos[0], min(self.max_pos, max(self.min_pos, mouse[1] + self.drag_offset[1]))))
 
-            self.time_distorting += delta_time
-        else:
-            self.time_distorting = 0
-            if mouse and self.drag:
-                if self.drag_axis == 0:
-                    self.update_pos((min(self.max_pos, max(self.min_pos, mouse[0] + self.drag_offset[0])), self.pos[1]))
-                else:
-                    self.update_pos((self.pos[0], min(self.max_pos, max(self.min_pos, mouse[1] + self.drag_offset[1]))))
-            
-        if self.drag_axis == 0:
-            self.path_distance = (self.pos[0] - WIDTH/2) * 8000
-        else:
-            self.path_distance = (HEIGHT/2 - self.pos[1]) * 8000
+        if self.tilting:
+            self.set_tilt(self.tilt_start[1] + (mouse[1 - self.drag_axis] - self.tilt_start[0]) * TILT_PER_PIXEL)
+
+    def update(self, delta_time, mouse, distorting):
+        self.noise_offset = self.noise.next() if self.noise else 0
+        if mouse:
+            self.follow(mouse, distorting)
+
+        self.update_path_distance()
+
+
+
+PHASE_STEPS = 1024 # phases closer than 2pi / PHASE_STEPS draw the same waveform
+waveform_cache = OrderedDict()
+WAVEFORM_CACHE_SIZE = 64
+
+def quantize_phase(phase):
+    return int(round(phase / (2*math.pi) * PHASE_STEPS)) % PHASE_STEPS
+
+def point_distances(n_points, spacing):
+    return waveform(n_points, spacing, None, None)
+
+def waveform(n_points, spacing, wavelength, phase_step):
+    # Unrotated unit waveform along a beam, with wavelength None giving the distances of the points
+    key = (n_points, spacing, wavelength, phase_step)
+    values = waveform_cache.get(key)
+    if values is None:
+        values = np.arange(n_points) * spacing
+        if wavelength is not None:
+            values = np.sin(values / wavelength * 2*np.pi + phase_step / PHASE_STEPS * 2*np.pi)
+        values.flags.writeable = False
+
+        waveform_cache[key] = values
+        if len(waveform_cache) > WAVEFORM_CACHE_SIZE:
+            waveform_cache.popitem(last=False)
+    else:
+        waveform_cache.move_to_end(key)
+
+    return values
 
 
 
@@ -323,32 +878,93 @@ class Laser():
         self.speed = 3_000_000_000
         self.frequency = self.speed / (wavelength / 1_000_000_000)
 
-        self.colour = wavelength_to_colour(self.wavelength, self.amplitude)
+        # Colour at full brightness, from the wavelength or the spectrum of the source
+        self.base_colour = wavelength_colour(self.wavelength)
+        self.full_colour = scale_colour(self.base_colour, 1)
+        self.colour = scale_colour(self.base_colour, self.amplitude)
 
         self.path_distance = 0
         self.phase = phase
 
+        # Realistic mode waveform, reused while the beam hasn't changed
+        self.point_spacing = 5
         self.laser_points = []
+        self.laser_points_key = None
+        self.laser_coords = np.empty((0, 2))
+        self.laser_offsets = np.empty(0)
+
+    snapshot_fields = ("start_x", "start_y", "end_x", "end_y", "amplitude", "colour", "base_colour", "full_colour", "phase", "path_distance")
+
+    def snapshot(self):
+        return take_fields(self, self.snapshot_fields)
+
+    def apply_snapshot(self, state):
+        set_fields(self, self.snapshot_fields, state)
 
     def update_amplitude(self, phase_difference):
         self.amplitude = phase_difference
-        self.colour = wavelength_to_colour(self.wavelength, self.amplitude)
+        self.colour = scale_colour(self.base_colour, self.amplitude)
+
+    def set_spectrum(self, spectrum):
+        # None goes back to the single wavelength colour
+        self.base_colour = wavelength_colour(self.wavelength) if spectrum is None else spectrum_colour(spectrum)
+        self.full_colour = scale_colour(self.base_colour, 1)
+        self.colour = scale_colour(self.base_colour, self.amplitude)
+
+    def update_laser_points(self):
+        length = dist_to((self.start_x, self.start_y), (self.end_x, self.end_y))
+        n_points = int(length / self.point_spacing) + 1
+        phase_step = quantize_phase(self.phase)
+
+        # Nothing has moved since the last frame
+        key = (self.start_x, self.start_y, self.end_x, self.end_y, self.amplitude, self.wavelength, phase_step)
+        if key == self.laser_points_key:
+            return self.laser_points
+        self.laser_points_key = key
+
+        if len(self.laser_coords) < n_points:
+            self.laser_coords = np.empty((2*n_points, 2))
+            self.laser_offsets = np.empty(2*n_points)
+        coords = self.laser_coords[:n_points]
+        offsets = self.laser_offsets[:n_points]
+
+        angle = math.atan2(self.end_y - self.start_y, self.end_x - self.start_x)
+        cos_angle = math.cos(angle)
+        sin_angle = math.sin(angle)
+
+        # Distance along the beam plus the sideways wave displacement
+        np.multiply(waveform(n_points, self.point_spacing, self.wavelength, phase_step), self.amplitude * 10, out=offsets)
+        distance = point_distances(n_points, self.point_spacing)
+
+        np.multiply(distance, cos_angle, out=coords[:, 0])
+        coords[:, 0] += offsets * sin_angle
+        coords[:, 0] += self.start_x
+
+        np.multiply(distance, sin_angle, out=coords[:, 1])
+        coords[:, 1] += offsets * cos_angle
+        coords[:, 1] += self.start_y
+
+        self.laser_points = coords.tolist()
+        return self.laser_points
 
     def draw(self):
         if not realistic:
-            pygame.draw.line(WIN, self.colour, (self.start_x, self.start_y), (self.end_x, self.end_y), self.width)
+            pygame.draw.line(window(), self.colour, (self.start_x, self.start_y), (self.end_x, self.end_y), self.width)
         else:
-            length = dist_to((self.start_x, self.start_y), (self.end_x, self.end_y))
-            x_difference = self.end_x - self.start_x
-            y_difference = self.end_y - self.start_y
-            angle = math.atan2(y_difference, x_difference)
-            self.laser_points.clear()
-            for i in range(int(length / 5) + 1):
-                self.laser_points.append((self.start_x + (i * 5) * math.cos(angle) + (self.amplitude * 10 * math.sin((i*5 / self.wavelength) * 2*math.pi + self.phase)) * math.sin(angle)
-                                        , self.start_y + (i * 5) * math.sin(angle) + (self.amplitude * 10 * math.sin((i*5 / self.wavelength) * 2*math.pi + self.phase)) * math.cos(angle)))
+            # The wave's height shows the amplitude, so it is drawn at full brightness
+            laser_points = self.update_laser_points()
+            if len(laser_points) > 1:
+                pygame.draw.lines(window(), self.full_colour, False, laser_points, self.width)
+
+    def dirty_parts(self):
+        padding = self.width + 2
+        state = (self.start_x, self.start_y, self.end_x, self.end_y, self.full_colour if realistic else self.colour, realistic)
+        if realistic:
+            padding += abs(self.amplitude) * 10
+            state += (self.amplitude, quantize_phase(self.phase))
 
-            if len(self.laser_points) > 1:
-                pygame.draw.lines(WIN, self.colour, False, self.laser_points, self.width)
+        rect = pygame.Rect(min(self.start_x, self.end_x), min(self.start_y, self.end_y), abs(self.end_x - self.start_x), abs(self.end_y - self.start_y))
+        return [(state, rect.inflate(2*padding, 2*padding))]
 
 
 
@@ -363,6 +979,26 @@ class Interferometer():
         self.wavelength = wavelength
         self.amplitude = amplitude
 
+        self.emitter_rect = pygame.Rect(WIDTH/4-25, HEIGHT/2-25/2, 50, 25)
+        self.detector_rect = pygame.Rect(WIDTH/2-25/2, 2.5*HEIGHT/4-25/2, 25, 25)
+
+        # What a screen at the detector would show, D shows it in the empty top left corner
+        self.screen = DetectorScreen((40, 50), DETECTOR_SCREEN_RESOLUTION)
+
+        self.engine = InterferometerEngine(wavelength, amplitude, centre=(WIDTH/2, HEIGHT/2))
+
+        # Strain is exaggerated far beyond a real wave so the fringes visibly move
+        self.strain_stream = StrainStream(SinusoidalStrain(amplitude=5e-4, frequency=0.5), sample_rate=DETECTOR_SAMPLE_RATE)
+        self.strain = 0
+        self.was_distorting = False
+
+        # Phase differences and intensities of every detector sample in the last step
+        self.block_phase_difference = np.empty(0)
+        self.block_intensity = np.empty(0)
+
+        # Broadband source, None for the single wavelength laser
+        self.spectrum = None
+
         self.laser_emitted = Laser((WIDTH/4+25, HEIGHT/2), self.right_mirror.pos, 4, self.amplitude, self.wavelength)
         self.split_laser = Laser((WIDTH/2, HEIGHT/2), self.top_mirror.pos, 4, self.amplitude, self.wavelength)
         self.resultant_laser = Laser((WIDTH/2, HEIGHT/2), (WIDTH/2, 2.5*HEIGHT/4-25/2), 4, self.amplitude, self.wavelength)
@@ -370,9 +1006,7 @@ class Interferometer():
         self.reflected_right_laser = Laser(self.right_mirror.pos, (WIDTH/2, HEIGHT/2), 2, self.amplitude, self.wavelength, phase=math.pi)
         self.reflected_top_laser = Laser(self.top_mirror.pos, (WIDTH/2, HEIGHT/2), 2, self.amplitude, self.wavelength, phase=math.pi)
 
-        self.path_difference = abs(self.top_mirror.path_distance - self.right_mirror.path_distance)
-
-        self.phase_difference = abs(abs(((self.path_difference % self.wavelength) / self.wavelength) - 0.5) - 0.5) * 2 # 1 if in phase, 0 if not
+        self.update_response()
 
     def check_drag(self, mouse):
         if dist_to(self.top_mirror.pos, mouse) < self.top_mirror.width:
@@ -386,42 +1020,147 @@ class Interferometer():
         self.top_mirror.drag = False
         self.right_mirror.drag = False
 
+    def check_tilt(self, mouse):
+        for mirror in (self.top_mirror, self.right_mirror):
+            if dist_to(mirror.pos, mouse) < mirror.width:
+                mirror.start_tilt(mouse)
+                break
+
+    def stop_tilt(self):
+        self.top_mirror.tilting = False
+        self.right_mirror.tilting = False
+
     def reset_mirrors(self):
         self.top_mirror.update_pos((WIDTH/2, HEIGHT/8))
         self.right_mirror.update_pos((7*WIDTH/8, HEIGHT/2))
 
+        self.top_mirror.set_tilt(0)
+        self.right_mirror.set_tilt(0)
+
+        # Jump straight there rather than interpolating across the reset
+        self.save_previous_pos()
+
+    def save_previous_pos(self):
+        # Called before every physics step, drawing interpolates from here
+        self.top_mirror.previous_pos = self.top_mirror.pos
+        self.right_mirror.previous_pos = self.right_mirror.pos
+
+    def follow(self, mouse, distorting):
+        self.top_mirror.follow(mouse, distorting)
+        self.right_mirror.follow(mouse, distorting)
+
+    def interpolate(self, alpha):
+        # Places the mirrors and beams between the last two physics steps for drawing
+        top_pos = self.top_mirror.interpolated_pos(alpha)
+        right_pos = self.right_mirror.interpolated_pos(alpha)
+
+        self.top_mirror.rect.center = top_pos
+        self.right_mirror.rect.center = right_pos
+
+        self.laser_emitted.end_x, self.laser_emitted.end_y = right_pos
+        self.split_laser.end_x, self.split_laser.end_y = top_pos
+
+        self.reflected_right_laser.start_x, self.reflected_right_laser.start_y = right_pos
+        self.reflected_top_laser.start_x, self.reflected_top_laser.start_y = top_pos
+
+    def update_response(self, strain=0):
+        # Strain may be a block of samples, the latest one is what gets displayed
+        top_path, right_path = apply_strain(self.top_mirror.path_distance, self.right_mirror.path_distance, strain)
+        response = self.engine.evaluate_paths(top_path, right_path)
+
+        self.top_path = latest(top_path)
+        self.right_path = latest(right_path)
+
+        self.path_difference = latest(response.path_difference)
+        self.phase_difference = latest(response.phase_difference) # 1 if in phase, 0 if not
+
+        if self.spectrum is not None:
+            response = response._replace(intensity=self.engine.broadband_intensity(top_path, right_path, self.spectrum))
+        self.intensity = latest(response.intensity)
+
+        return response
+
+    def set_noise(self, sample_rate):
+        # Independent shot, seismic and thermal-like noise on each mirror, None turns it off
+        self.top_mirror.noise = None if sample_rate is None else DisplacementNoise(sample_rate, seed=1)
+        self.right_mirror.noise = None if sample_rate is None else DisplacementNoise(sample_rate, seed=2)
+
+    def set_cavities(self, cavities):
+        # Switches between the simple Michelson and one with Fabry-Perot arm cavities
+        engine = CavityEngine if cavities else InterferometerEngine
+        self.engine = engine(self.wavelength, self.amplitude, centre=(WIDTH/2, HEIGHT/2))
+        self.update_response(self.strain)
+
+    def lasers(self):
+        return (self.laser_emitted, self.split_laser, self.resultant_laser, self.reflected_right_laser, self.reflected_top_laser)
+
+    snapshot_fields = ("top_path", "right_path")
+
+    def snapshot(self):
+        return (self.top_mirror.snapshot(), self.right_mirror.snapshot(), tuple(laser.snapshot() for laser in self.lasers()), take_fields(self, self.snapshot_fields), self.screen.visible)
+
+    def apply_snapshot(self, state):
+        top_mirror, right_mirror, lasers, fields, self.screen.visible = state
+        set_fields(self, self.snapshot_fields, fields)
+        self.top_mirror.apply_snapshot(top_mirror)
+        self.right_mirror.apply_snapshot(right_mirror)
+        for laser, laser_state in zip(self.lasers(), lasers):
+            laser.apply_snapshot(laser_state)
+
+    def set_spectrum(self, spectrum):
+        self.spectrum = spectrum
+        for laser in self.lasers():
+            laser.set_spectrum(spectrum)
+
     def update(self, delta_time, mouse, distorting):
         # Updating mirrors
         self.top_mirror.update(delta_time, mouse, distorting)
         self.right_mirror.update(delta_time, mouse, distorting)
 
-        # Updating interferometer values
-        self.path_difference = abs(2*self.top_mirror.path_distance - 2*self.right_mirror.path_distance)
-        self.phase_difference = abs(abs(((self.path_difference % self.wavelength) / self.wavelength) - 0.5) - 0.5) * 2
+        # Updating interferometer values. The detector is sampled at the strain's rate,
+        # a whole block of samples per step, and the wave starts over each time it is turned on
+        if distorting and not self.was_distorting:
+            self.strain_stream.reset()
+        self.was_distorting = distorting
+
+        times, strain = self.strain_stream.advance(delta_time)
+        if distorting and len(strain):
+            self.strain = float(strain[-1])
+            response = self.update_response(strain)
+            self.block_phase_difference = response.phase_difference
+            self.block_intensity = response.intensity
+        else:
+            if not distorting:
+                self.strain = 0
+            self.update_response(self.strain)
+
+            # Nothing moves the mirrors within a step, so the output holds over its samples
+            self.block_phase_difference = np.full(len(strain), self.phase_difference)
+            self.block_intensity = np.full(len(strain), self.intensity)
 
         # Updating laser path distances
-        self.laser_emitted.path_distance = self.right_mirror.path_distance
-        self.split_laser.path_distance = self.top_mirror.path_distance
+        self.laser_emitted.path_distance = self.right_path
+        self.split_laser.path_distance = self.top_path
 
         self.laser_emitted.end_x, self.laser_emitted.end_y = self.right_mirror.pos
         self.split_laser.end_x, self.split_laser.end_y = self.top_mirror.pos
 
         # Updating colour of resultant laser
-        self.resultant_laser.update_amplitude(self.phase_difference * self.amplitude * 2)
+        self.resultant_laser.update_amplitude(self.intensity)
 
         # Updating phase of reflected lasers
-        right_end_phase = (self.right_mirror.path_distance % self.wavelength) / self.wavelength * 2*math.pi
+        right_end_phase = float(end_phase(self.right_path, self.wavelength))
 
         self.reflected_right_laser.start_x, self.reflected_right_laser.start_y = self.right_mirror.pos
         self.reflected_right_laser.phase = (right_end_phase + math.pi) % 2*math.pi
 
-        top_end_phase = (self.top_mirror.path_distance % self.wavelength) / self.wavelength * 2*math.pi
+        top_end_phase = float(end_phase(self.top_path, self.wavelength))
 
         self.reflected_top_laser.start_x, self.reflected_top_laser.start_y = self.top_mirror.pos
         self.reflected_top_laser.phase = (top_end_phase + math.pi) % 2*math.pi
 
         # Updating phase of resultant laser
-        self.resultant_laser.phase = (self.path_difference % self.wavelength) / self.wavelength * 2*math.pi
+        self.resultant_laser.phase = float(end_phase(self.path_difference, self.wavelength))
     
     def draw(self):
         # Draw lasers
@@ -440,10 +1179,129 @@ class Interferometer():
         self.split_mirror.draw()
 
         # Draw Laser Emitter
-        pygame.draw.rect(WIN, (255, 255, 255), (WIDTH/4-25, HEIGHT/2-25/2, 50, 25))
+        pygame.draw.rect(window(), (255, 255, 255), self.emitter_rect)
 
         # Draw Detector
-        pygame.draw.rect(WIN, (255, 255, 255), (WIDTH/2-25/2, 2.5*HEIGHT/4-25/2, 25, 25))
+        pygame.draw.rect(window(), (255, 255, 255), self.detector_rect)
+
+        self.screen.draw(self)
+
+    def dirty_parts(self):
+        parts = []
+        for laser in (self.resultant_laser, self.laser_emitted, self.split_laser, self.reflected_right_laser, self.reflected_top_laser):
+            parts += laser.dirty_parts()
+
+        for mirror in (self.top_mirror, self.right_mirror, self.split_mirror):
+            parts += mirror.dirty_parts()
+
+        # Emitter and detector never change
+        parts.append((None, self.emitter_rect))
+        parts.append((None, self.detector_rect))
+
+        parts += self.screen.dirty_parts(self)
+        return parts
+
+
+
+class ProfilerOverlay():
+    # HUD listing the p50 and p99 time of every profiled stage
+    def __init__(self, pos, profiler, refresh_time=0.25) -> None:
+        self.pos = pos
+        self.profiler = profiler
+        self.visible = False
+
+        self.refresh_time = refresh_time
+        self.refresh_timer = refresh_time
+        self.lines = []
+
+        self.line_height = 20
+        self.width = 330
+
+    def update(self, delta_time):
+        # Percentiles are only recalculated a few times a second
+        self.refresh_timer += delta_time
+        if self.visible and self.refresh_timer >= self.refresh_time:
+            self.refresh_timer = 0
+            self.lines = ["Stage  p50 / p99 ms"] + [f"{name}  {p50:.3f} / {p99:.3f}" for name, p50, p99 in self.profiler.summary()]
+
+    def rect(self):
+        return pygame.Rect(self.pos[0], self.pos[1], self.width, len(self.lines) * self.line_height + 10)
+
+    def draw(self):
+        if not self.visible:
+            return
+
+        pygame.draw.rect(window(), (20, 20, 30), self.rect())
+        for i, line in enumerate(self.lines):
+            window().blit(render_text(line), (self.pos[0] + 5, self.pos[1] + 5 + i * self.line_height))
+
+    def dirty_parts(self):
+        return [((self.visible, tuple(self.lines)), self.rect())]
+
+
+
+class DirtyRenderer():
+    # Redraws only the parts of the screen that changed since the last frame.
+    # Each layer has draw() and dirty_parts(), a list of (state, rect) pairs; a part
+    # is dirty when its state changes, and its old and new rects are redrawn.
+    def __init__(self, surface, background, layers) -> None:
+        self.surface = surface
+        self.background = background
+        self.layers = layers
+
+        self.parts = [None] * len(layers)
+
+    def dirty_rects(self):
+        rects = []
+        for i, layer in enumerate(self.layers):
+            parts = layer.dirty_parts()
+            previous = self.parts[i]
+
+            if previous is None or len(previous) != len(parts):
+                rects += [rect for state, rect in parts]
+                if previous:
+                    rects += [rect for state, rect in previous]
+            else:
+                for (state, rect), (previous_state, previous_rect) in zip(parts, previous):
+                    if state != previous_state or rect != previous_rect:
+                        rects.append(rect)
+                        rects.append(previous_rect)
+
+            self.parts[i] = parts
+
+        return merge_rects(rects)
+
+    def render(self):
+        rects = self.dirty_rects()
+        for rect in rects:
+            self.surface.set_clip(rect)
+            self.surface.fill(self.background, rect)
+            for i, layer in enumerate(self.layers):
+                if rect.collidelist([part_rect for state, part_rect in self.parts[i]]) != -1:
+                    layer.draw()
+
+        self.surface.set_clip(None)
+        return rects
+
+
+
+def merge_rects(rects):
+    # Joins overlapping rects so no area is redrawn twice
+    merged = []
+    for rect in rects:
+        rect = rect.clip(window().get_rect())
+        if rect.width == 0 or rect.height == 0:
+            continue
+
+        overlapping = rect.collidelistall(merged)
+        while overlapping:
+            for i in reversed(overlapping):
+                rect.union_ip(merged.pop(i))
+            overlapping = rect.collidelistall(merged)
+
+        merged.append(rect)
+
+    return merged
 
 
 
@@ -451,12 +1309,95 @@ running = True
 distorting = False
 realistic = False
 
-interferometer = Interferometer(wavelength=1064, amplitude=0.5)
-graph = Graph((WIDTH/2, HEIGHT-125), WIDTH*3.5/4, 250, (10, 10, 15), x_start=0, x_end=30, y_start=0, y_end=1)
-realistic_toggle = Toggle((WIDTH - 100, 25), 25, 25, "Realistic", (255, 255, 255), realistic)
+# The simulation and its widgets, made by setup()
+interferometer = None
+graph = None
+realistic_toggle = None
+fps_label = None
+
+# Physics and graph sampling run at a fixed rate independent of the frame rate
+PHYSICS_RATE = 1000
+DETECTOR_SAMPLE_RATE = 16000 # the strain and the detector output, a block of samples every physics step
+scheduler = None
+
+# Spectrum of the detector intensity at every physics step and the detector network,
+# F cycles between them and the time graph
+spectrum_graph = None
+network_view = None
+
+# Times each stage of the main loop, P shows the overlay and T saves a trace
+profiler = None
+profiler_overlay = None
+TRACE_PATH = "trace.json"
+
+# Only redraw what changed and sleep while nothing is happening, turned on with --dirty-rects
+dirty_rects = False
+renderer = None
+IDLE_TIMEOUT = 500 # milliseconds to wait for an event when the scene is static
+
+# Detectors spread over the globe, all seeing one circularly polarised wave while distorting
+NETWORK_SIZE = 256
+
+def create_network():
+    network = random_network(NETWORK_SIZE, seed=0, wavelengths=(400, 700))
+    network.set_sky_position(right_ascension=1.0, declination=0.5, polarisation=0.3)
+    network.set_source(SinusoidalStrain(amplitude=5e-5, frequency=1), SinusoidalStrain(amplitude=5e-5, frequency=1, phase=math.pi/2))
+    return network
+
+def create_scene(points=None):
+    # The interferometer, time graph, spectrum graph and detector network view
+    return (
+        Interferometer(wavelength=1064, amplitude=0.5),
+        Graph((WIDTH/2, HEIGHT-125), WIDTH*3.5/4, 250, (10, 10, 15), x_start=0, x_end=30, y_start=0, y_end=1, points=points),
+        SpectrumGraph((WIDTH/2, HEIGHT-125), WIDTH*3.5/4, 250, (10, 10, 15), WelchEstimator(DETECTOR_SAMPLE_RATE, segment_length=16384)),
+        NetworkView((WIDTH/2, HEIGHT-125), WIDTH*3.5/4, 250, create_network()),
+    )
+
+def setup():
+    # Builds the simulation state used by simulate_frame and draw_frame, without opening a window
+    global interferometer, graph, realistic_toggle, fps_label, scheduler, spectrum_graph, network_view, profiler, profiler_overlay
+
+    interferometer, graph, spectrum_graph, network_view = create_scene()
+    realistic_toggle = Toggle((WIDTH - 100, 25), 25, 25, "Realistic", (255, 255, 255), realistic)
+    fps_label = Label((0, 0), "FPS: 0")
+
+    scheduler = FixedStepScheduler(PHYSICS_RATE)
+
+    profiler = StageProfiler()
+    profiler_overlay = ProfilerOverlay((0, 25), profiler)
+
+# Every detector sample taken while graphing is appended to a binary recording in the background, opened by main()
+RECORDING_PATH = "data.ifr"
+recorder = None
+
+def record_block():
+    # The step's samples, timed by how many have been recorded since the last reset so they stay evenly spaced
+    samples = len(interferometer.block_intensity)
+    if recorder is None or not graphing or samples == 0:
+        return
+
+    rows = np.empty((samples, len(recorder.columns)))
+    rows[:, 0] = (recorder.rows + np.arange(1, samples + 1)) / DETECTOR_SAMPLE_RATE
+    rows[:, 1] = interferometer.top_mirror.pos[1]
+    rows[:, 2] = interferometer.right_mirror.pos[0]
+    rows[:, 3] = interferometer.block_phase_difference
+    rows[:, 4] = interferometer.block_intensity
+    recorder.record_block(rows)
+
+def save_data():
+    # Text export runs on its own thread once the recorder has caught up
+    if recorder is not None:
+        recorder.export("data.txt")
+
+# Inputs of every frame are logged here with --record-session, see replay.py
+session_log = None
 
 def quit():
     # closes pygame and quits the application
+    if recorder is not None:
+        recorder.close()
+    if session_log is not None:
+        session_log.close()
     pygame.quit()
     sys.exit(0)
 
@@ -485,28 +1426,19 @@ def get_average_fps(delta_time):
 
 
 
-delta_time = 1
-
 graphing = False
 
-# Main loop
-while running:
-    start_time = perf_counter()
-
-    WIN.fill((0, 0, 0))
+# Last known mouse position, wheel events don't carry one
+mouse_pos = (0, 0)
 
-    interferometer.draw()
-    graph.draw()
-    realistic_toggle.draw()
-    
-    # Fps text
-    fps_text = font.render(f"FPS: {round(get_average_fps(delta_time))}", True, (255, 255, 255))
-    WIN.blit(fps_text, (0, 0))
+def handle_events(events):
+    # Returns the mouse events that move the mirrors, in order, see apply_mouse_event
+    global distorting, graphing, realistic, mouse_pos
 
-    mouse = None
+    mouse_events = []
 
     # Looping through events
-    for event in pygame.event.get():
+    for event in events:
         if event.type == pygame.KEYDOWN:
             if event.key == pygame.K_ESCAPE:
                 quit()
@@ -521,6 +1453,9 @@ while running:
                 # Resets everything
                 graph.points.clear()
 
+                if recorder is not None:
+                    recorder.clear()
+
                 if graphing:
                     graphing = False
                 
@@ -530,35 +1465,296 @@ while running:
                 interferometer.reset_mirrors()
 
                 graph.graph_total_time = 0
+                graph.graph_timer = 0
+                graph.reset_view()
+
+                spectrum_graph.reset()
+                network_view.reset()
 
             if event.key == pygame.K_s:
                 # Save data to file
-                data = open("data.txt", "w")
-                for point in graph.points:
-                    data.write(f"Time: {round(point[0], 6)}         Intensity: {round(point[1], 6)}\n")
-                data.close()
+                save_data()
+
+            if event.key == pygame.K_b:
+                # Switch between the laser and a white light source
+                interferometer.set_spectrum(white_light_spectrum() if interferometer.spectrum is None else None)
+
+            if event.key == pygame.K_f:
+                # Cycles the bottom panel
+                panels = (graph, spectrum_graph, network_view)
+                shown = next(i for i, panel in enumerate(panels) if panel.visible)
+                for panel in panels:
+                    panel.visible = False
+                panels[(shown + 1) % len(panels)].visible = True
+
+            if event.key == pygame.K_d:
+                interferometer.screen.visible = not interferometer.screen.visible
+
+            if event.key == pygame.K_c:
+                interferometer.set_cavities(not isinstance(interferometer.engine, CavityEngine))
+
+            if event.key == pygame.K_n:
+                interferometer.set_noise(None if interferometer.top_mirror.noise else PHYSICS_RATE)
+
+            if event.key == pygame.K_p:
+                profiler_overlay.visible = not profiler_overlay.visible
+                profiler_overlay.refresh_timer = profiler_overlay.refresh_time
+
+            if event.key == pygame.K_t:
+                profiler.write_trace(TRACE_PATH)
 
 
         elif event.type == pygame.QUIT:
             quit()
 
         elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-            mouse = pygame.mouse.get_pos()
-            interferometer.check_drag(mouse)
+            mouse_pos = event.pos
+            mouse_events.append(event)
 
-            realistic = realistic_toggle.check_click(mouse)
+            realistic = realistic_toggle.check_click(mouse_pos)
+
+            # Dragging the graph pans back through the history
+            if graph.visible and graph.rect().collidepoint(mouse_pos):
+                graph.start_pan(mouse_pos)
+
+        elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 3:
+            mouse_pos = event.pos
+            mouse_events.append(event)
 
         elif event.type == pygame.MOUSEMOTION:
-            mouse = pygame.mouse.get_pos()
+            mouse_pos = event.pos
+            mouse_events.append(event)
+            graph.pan(mouse_pos)
 
         elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
-            interferometer.stop_drag()
+            mouse_events.append(event)
+            graph.stop_pan()
+
+        elif event.type == pygame.MOUSEBUTTONUP and event.button == 3:
+            mouse_events.append(event)
+
+        elif event.type == pygame.MOUSEWHEEL:
+            if graph.visible and graph.rect().collidepoint(mouse_pos):
+                graph.zoom(mouse_pos, event.y)
+
+    return mouse_events
+
+def apply_mouse_event(event):
+    # The left button drags a mirror and the right button tilts one
+    if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+        interferometer.check_drag(event.pos)
+    elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 3:
+        interferometer.check_tilt(event.pos)
+    elif event.type == pygame.MOUSEMOTION:
+        interferometer.follow(event.pos, distorting)
+    elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+        interferometer.stop_drag()
+    elif event.type == pygame.MOUSEBUTTONUP and event.button == 3:
+        interferometer.stop_tilt()
+
+
+
+# Held until a physics step uses them, frames can be shorter than a step
+pending_mouse_events = []
+
+def simulate_frame(delta_time, events):
+    # Everything that changes the simulation in a frame. The same events and
+    # delta times always give the same results, which is what replay.py relies on.
+    with profiler.stage("events"):
+        pending_mouse_events.extend(handle_events(events))
+
+    detector_samples = []
+    steps = scheduler.advance(delta_time)
+    for step in range(steps):
+        # Drawing interpolates over the last step, from where the mirrors were before it
+        interferometer.save_previous_pos()
+
+        # Mouse events are shared out over the steps in order, so a drag that starts
+        # and ends within one frame still moves the mirror
+        n_events = len(pending_mouse_events)
+        for event in pending_mouse_events[n_events * step // steps:n_events * (step + 1) // steps]:
+            apply_mouse_event(event)
+
+        with profiler.stage("interferometer.update"):
+            interferometer.update(scheduler.step_time, None, distorting)
+
+        with profiler.stage("graph.update"):
+            graph.update(scheduler.step_time, graphing, interferometer.resultant_laser.amplitude)
+        record_block()
+
+        detector_samples.append(interferometer.block_intensity)
+
+    if steps:
+        pending_mouse_events.clear()
+
+    with profiler.stage("spectrum.update"):
+        spectrum_graph.update(delta_time, np.concatenate(detector_samples) if detector_samples else np.empty(0))
+
+    # The whole network in one vectorized evaluation
+    with profiler.stage("network.update"):
+        network_view.update((np.arange(scheduler.steps - steps, scheduler.steps) + 1) * scheduler.step_time, distorting)
+
+def draw_frame(scene=None, alpha=None):
+    # scene defaults to the simulation's own objects, in threaded mode it is a copy fed by snapshots
+    scene_interferometer, scene_graph, scene_spectrum_graph, scene_network_view = scene or (interferometer, graph, spectrum_graph, network_view)
+    scene_interferometer.interpolate(scheduler.alpha if alpha is None else alpha)
+
+    window().fill((0, 0, 0))
+
+    with profiler.stage("interferometer.draw"):
+        scene_interferometer.draw()
+    with profiler.stage("graph.draw"):
+        scene_graph.draw()
+        scene_spectrum_graph.draw()
+        scene_network_view.draw()
+    with profiler.stage("toggle.draw"):
+        realistic_toggle.draw()
+
+    # Fps text
+    with profiler.stage("fps.draw"):
+        fps_label.draw()
+
+    profiler_overlay.draw()
+
+
+
+# Everything drawing needs from one simulation tick, never changed once made
+Snapshot = namedtuple("Snapshot", ["interferometer", "graph", "spectrum_graph", "network_view", "alpha"])
+
+def take_snapshot():
+    return Snapshot(interferometer.snapshot(), graph.snapshot(), spectrum_graph.snapshot(), network_view.snapshot(), scheduler.alpha)
+
+def apply_snapshot(snapshot, scene):
+    for obj, state in zip(scene, snapshot[:-1]):
+        obj.apply_snapshot(state)
+
+SIMULATION_RATE = 500 # ticks per second of the simulation thread, each runs as many physics steps as are due
+FRAME_RATE = 60 # drawing is capped in threaded mode so it doesn't starve the simulation thread
+
+class SimulationThread(threading.Thread):
+    # Runs simulate_frame on its own thread at a steady rate so slow drawing can't hold up
+    # acquisition. Input events arrive through a queue, and after every tick a new
+    # Snapshot replaces the published one in a single assignment. The drawing thread
+    # keeps whichever one it picked up while the next is built, so it never blocks
+    # and never sees half of a tick.
+    def __init__(self, rate=SIMULATION_RATE) -> None:
+        super().__init__(daemon=True)
+        self.tick_time = 1 / rate
+        self.events = queue.Queue()
+        self.stopping = threading.Event()
+
+        self.snapshot = take_snapshot()
+
+    def run(self):
+        last_time = perf_counter()
+        while not self.stopping.is_set():
+            events = []
+            while not self.events.empty():
+                events += self.events.get_nowait()
+
+            start_time = perf_counter()
+            delta_time = start_time - last_time
+            last_time = start_time
+
+            if session_log is not None:
+                session_log.write_frame(delta_time, events)
+
+            simulate_frame(delta_time, events)
+            self.snapshot = take_snapshot()
+
+            self.stopping.wait(max(0, self.tick_time - (perf_counter() - start_time)))
+
+    def stop(self):
+        self.stopping.set()
+        self.join()
+
+def quit_requested(events):
+    return any(event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE) for event in events)
+
+
+
+def main(argv=None):
+    global dirty_rects, renderer, recorder, session_log
+
+    parser = argparse.ArgumentParser(description="Michelson interferometer simulation")
+    parser.add_argument("--dirty-rects", action="store_true", help="only redraw what changed and idle when nothing moves")
+    parser.add_argument("--record-session", metavar="PATH", help="log every frame's inputs for replay.py")
+    parser.add_argument("--threaded", action="store_true", help="run the simulation on its own thread, drawing from snapshots")
+    args = parser.parse_args(argv)
+
+    setup()
+    window()
+
+    recorder = DataRecorder(RECORDING_PATH)
+    if args.record_session:
+        session_log = SessionWriter(args.record_session, PHYSICS_RATE)
+
+    # What gets drawn, in threaded mode a second set of objects sharing the graph's history
+    simulation = None
+    scene = (interferometer, graph, spectrum_graph, network_view)
+    if args.threaded:
+        scene = create_scene(points=graph.points)
+        simulation = SimulationThread()
+        simulation.start()
+    clock = pygame.time.Clock()
+
+    dirty_rects = args.dirty_rects
+    if dirty_rects:
+        renderer = DirtyRenderer(window(), (0, 0, 0), [*scene, realistic_toggle, fps_label, profiler_overlay])
+
+    delta_time = 1
+
+    # Main loop
+    while running:
+        start_time = perf_counter()
+
+        fps_label.text = f"FPS: {round(get_average_fps(delta_time))}"
+        profiler_overlay.update(delta_time)
+
+        alpha = scheduler.alpha
+        if simulation is not None:
+            snapshot = simulation.snapshot
+            apply_snapshot(snapshot, scene)
+            alpha = snapshot.alpha
+
+        if dirty_rects:
+            scene[0].interpolate(alpha)
+            with profiler.stage("render"):
+                rects = renderer.render()
+        else:
+            draw_frame(scene, alpha)
+
+        with profiler.stage("display.update"):
+            if dirty_rects:
+                pygame.display.update(rects)
+            else:
+                pygame.display.update()
+
+        if dirty_rects and not distorting and not graphing and interferometer.top_mirror.noise is None:
+            # Nothing moves on its own, so block until something happens. Mirror noise
+            # moves the mirrors every step, so like distorting it keeps the loop running
+            with profiler.stage("idle"):
+                events = [pygame.event.wait(IDLE_TIMEOUT)] + pygame.event.get()
+        else:
+            events = pygame.event.get()
+
+        if simulation is not None:
+            if quit_requested(events):
+                simulation.stop()
+                quit()
+
+            simulation.events.put(events)
+            clock.tick(FRAME_RATE)
+        else:
+            if session_log is not None:
+                session_log.write_frame(delta_time, events)
+
+            simulate_frame(delta_time, events)
 
-    interferometer.update(delta_time, mouse, distorting)
+        end_time = perf_counter()
+        delta_time = end_time - start_time
 
-    graph.update(delta_time, graphing, interferometer.resultant_laser.amplitude)
 
-    pygame.display.update()
 
-    end_time = perf_counter()
-    delta_time = end_time - start_time
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import numpy as np
+
+from physics import InterferometerEngine
+from strain import apply_strain, C
+
+# A network of detectors at different sites on the Earth, all seeing the same
+# gravitational wave. Every property of the detectors lives in one NumPy array
+# per property with a row per detector, so evaluating the whole network at a
+# block of times is a handful of array operations however many there are.
+#
+# Each detector responds with its antenna pattern F+ h+ + Fx hx, evaluated at
+# the time the wave reaches its site. The sky direction and polarisation of
+# the wave are Earth fixed, the Earth doesn't rotate during a run.
+
+EARTH_RADIUS = 6.371e6 # metres
+
+
+
+def unit_vector(latitude, longitude):
+    # Earth centred unit vectors, angles in radians, shape (..., 3)
+    latitude = np.asarray(latitude, dtype=np.float64)
+    longitude = np.asarray(longitude, dtype=np.float64)
+    return np.stack((np.cos(latitude) * np.cos(longitude), np.cos(latitude) * np.sin(longitude), np.sin(latitude)), axis=-1)
+
+
+def arm_directions(latitude, longitude, azimuth):
+    # Unit vectors along the arms in the local horizontal plane, azimuth measured
+    # from north towards east for the x arm, the y arm is 90 degrees anticlockwise of it
+    latitude = np.asarray(latitude, dtype=np.float64)[..., None]
+    longitude = np.asarray(longitude, dtype=np.float64)[..., None]
+    azimuth = np.asarray(azimuth, dtype=np.float64)[..., None]
+
+    east = np.concatenate((-np.sin(longitude), np.cos(longitude), np.zeros_like(longitude)), axis=-1)
+    north = np.concatenate((-np.sin(latitude) * np.cos(longitude), -np.sin(latitude) * np.sin(longitude), np.cos(latitude)), axis=-1)
+
+    x_arm = np.cos(azimuth) * north + np.sin(azimuth) * east
+    y_arm = np.sin(azimuth) * north - np.cos(azimuth) * east
+    return x_arm, y_arm
+
+
+def polarisation_tensors(right_ascension, declination, polarisation):
+    # Plus and cross tensors of a wave coming from the given direction
+    direction = unit_vector(declination, right_ascension)
+
+    # Two axes across the direction of travel, turned by the polarisation angle
+    m = np.array([-np.sin(right_ascension), np.cos(right_ascension), 0])
+    n = np.cross(direction, m)
+    m, n = np.cos(polarisation) * m + np.sin(polarisation) * n, -np.sin(polarisation) * m + np.cos(polarisation) * n
+
+    plus = np.outer(m, m) - np.outer(n, n)
+    cross = np.outer(m, n) + np.outer(n, m)
+    return direction, plus, cross
+
+
+
+class DetectorNetwork():
+    def __init__(self, latitude, longitude, azimuth, x_path, y_path, wavelength, amplitude=0.5) -> None:
+        # One value per detector in every array, angles in radians and lengths in nanometres
+        self.latitude = np.asarray(latitude, dtype=np.float64)
+        self.longitude = np.asarray(longitude, dtype=np.float64)
+        self.azimuth = np.asarray(azimuth, dtype=np.float64)
+
+        self.x_path = np.asarray(x_path, dtype=np.float64)
+        self.y_path = np.asarray(y_path, dtype=np.float64)
+
+        # Wavelength and amplitude arrays broadcast through the engine like positions do
+        self.engine = InterferometerEngine(np.asarray(wavelength, dtype=np.float64), np.asarray(amplitude, dtype=np.float64))
+
+        self.positions = EARTH_RADIUS * unit_vector(self.latitude, self.longitude)
+        x_arm, y_arm = arm_directions(self.latitude, self.longitude, self.azimuth)
+        self.tensors = 0.5 * (x_arm[:, :, None] * x_arm[:, None, :] - y_arm[:, :, None] * y_arm[:, None, :])
+
+        self.plus = None
+        self.cross = None
+        self.set_sky_position(0, 0, 0)
+
+    def __len__(self):
+        return len(self.latitude)
+
+    def set_sky_position(self, right_ascension, declination, polarisation):
+        direction, plus, cross = polarisation_tensors(right_ascension, declination, polarisation)
+
+        self.f_plus = np.einsum("nij,ij->n", self.tensors, plus)
+        self.f_cross = np.einsum("nij,ij->n", self.tensors, cross)
+
+        # The wave reaches sites facing the source first, relative to the Earth's centre
+        self.delay = -(self.positions @ direction) / C
+
+    def set_source(self, plus, cross=None):
+        # StrainSources for the two polarisations, cross defaults to none
+        self.plus = plus
+        self.cross = cross
+
+    def strain(self, times):
+        # Strain seen by every detector, shape (len(times), detectors)
+        times = np.asarray(times, dtype=np.float64)[:, None] - self.delay
+        strain = np.zeros(times.shape)
+        if self.plus is not None:
+            strain += self.f_plus * self.plus.strain(times)
+        if self.cross is not None:
+            strain += self.f_cross * self.cross.strain(times)
+        return strain
+
+    def evaluate(self, times, strain=True):
+        # Response of every detector at every time, fields shaped (len(times), detectors)
+        h = self.strain(times) if strain else np.zeros((len(times), len(self)))
+        return self.engine.evaluate_paths(*apply_strain(self.x_path, self.y_path, h))
+
+
+
+def random_network(n_detectors, seed=0, path=3_200_000, path_spread=400_000, wavelengths=(500, 1100)):
+    # Detectors spread over the globe with random orientations, arm lengths and wavelengths
+    rng = np.random.default_rng(seed)
+    return DetectorNetwork(
+        latitude=np.arcsin(rng.uniform(-1, 1, n_detectors)),
+        longitude=rng.uniform(-np.pi, np.pi, n_detectors),
+        azimuth=rng.uniform(0, 2*np.pi, n_detectors),
+        x_path=path + rng.uniform(-path_spread, path_spread, n_detectors),
+        y_path=path + rng.uniform(-path_spread, path_spread, n_detectors),
+        wavelength=rng.uniform(*wavelengths, n_detectors),
+    )
@@ -0,0 +1,84 @@
+import numpy as np
+
+# Displacement noise for the mirrors, in nanometres of path. Shot noise is
+# white, thermal-like noise is white low pass filtered above a corner around
+# 100 Hz, and seismic noise is filtered twice with a low corner so it is
+# strong at low frequencies and falls steeply above it. Samples come from a
+# seeded generator, so the same seed always gives the same noise.
+
+FILTER_BLOCK = 256 # most samples per closed form filter block
+MIN_POWER = 1e-100 # smallest power of the pole in a block, far above where it underflows
+
+
+
+def low_pass(white, pole, state):
+    # One pole filter y[n] = pole * y[n-1] + white[n], returns (y, last y)
+    out = np.empty_like(white)
+
+    # Shorter blocks for smaller poles, so pole^block never underflows to zero
+    block_length = FILTER_BLOCK
+    if 0 < pole < 1:
+        block_length = int(min(FILTER_BLOCK, max(1, np.log(MIN_POWER) / np.log(pole))))
+
+    for start in range(0, len(white), block_length):
+        block = white[start:start + block_length]
+        powers = pole ** np.arange(1, len(block) + 1)
+
+        # y[n] = pole^(n+1) * (state + sum over k <= n of white[k] / pole^(k+1))
+        out[start:start + len(block)] = powers * (state + np.cumsum(block / powers))
+        state = out[start + len(block) - 1]
+
+    return out, state
+
+
+def pole_for(corner_frequency, sample_rate):
+    return np.exp(-2*np.pi * corner_frequency / sample_rate)
+
+
+
+class DisplacementNoise():
+    def __init__(self, sample_rate, shot=0.5, seismic=20, thermal=2, seismic_corner=1, thermal_corner=100, seed=0, chunk_size=1024) -> None:
+        self.sample_rate = sample_rate
+        self.chunk_size = chunk_size
+
+        # Standard deviations of each kind of noise in nm
+        self.shot = shot
+        self.seismic = seismic
+        self.thermal = thermal
+
+        self.seismic_pole = pole_for(seismic_corner, sample_rate)
+        self.thermal_pole = pole_for(thermal_corner, sample_rate)
+
+        self.seed = seed
+        self.reset()
+
+    def reset(self):
+        self.generator = np.random.default_rng(self.seed)
+        self.seismic_state = [0.0, 0.0]
+        self.thermal_state = 0.0
+
+        self.samples = np.empty(0)
+        self.position = 0
+
+    def chunk(self, n):
+        # The next n samples of displacement
+        noise = self.generator.standard_normal((3, n))
+
+        # Each filter is normalised so its output has unit variance
+        seismic, self.seismic_state[0] = low_pass(noise[0], self.seismic_pole, self.seismic_state[0])
+        seismic, self.seismic_state[1] = low_pass(seismic, self.seismic_pole, self.seismic_state[1])
+        seismic *= (1 - self.seismic_pole**2)**1.5 / np.sqrt(1 + self.seismic_pole**2)
+
+        thermal, self.thermal_state = low_pass(noise[1], self.thermal_pole, self.thermal_state)
+        thermal *= np.sqrt(1 - self.thermal_pole**2)
+
+        return self.shot * noise[2] + self.seismic * seismic + self.thermal * thermal
+
+    def next(self):
+        # One sample at a time, generated a chunk at a time
+        if self.position == len(self.samples):
+            self.samples = self.chunk(self.chunk_size)
+            self.position = 0
+
+        self.position += 1
+        return float(self.samples[self.position - 1])
@@ -0,0 +1,197 @@
+import numpy as np
+from collections import OrderedDict
+
+from physics import PATH_SCALE, Response, InterferometerEngine
+
+# Interferometers with arm cavities, using complex transfer matrices.
+# Each arm is a chain of components (partial mirrors and spaces) and each
+# component is a 2x2 matrix taking the (forward, backward) field amplitudes on
+# its right to those on its left, so a chain is the product of its matrices.
+# Everything is batched: wavelengths and mirror displacements are arrays that
+# broadcast together and become leading dimensions of stacks of matrices.
+# The parts of a chain either side of the moving space never change, so their
+# products are cached per wavelength array and only the moving space is
+# recomputed each step.
+#
+# Reflection from the left of a mirror is +r and from the right -r, so a
+# lossless mirror conserves power. Lengths and wavelengths are in nanometres.
+
+STATIC_CACHE_SIZE = 16
+
+
+
+class PartialMirror():
+    def __init__(self, reflectivity, loss=0) -> None:
+        # reflectivity and loss are fractions of the power
+        if reflectivity < 0 or loss < 0 or reflectivity + loss > 1:
+            raise ValueError(f"Mirror reflectivity {reflectivity} and loss {loss} must be positive and add up to at most 1")
+
+        self.reflectivity = reflectivity
+        self.loss = loss
+
+        self.r = np.sqrt(reflectivity)
+        self.t = np.sqrt(1 - reflectivity - loss)
+
+    def matrix(self, wavelength):
+        if self.t == 0:
+            # Nothing gets through a perfect mirror, it can only end a chain as its load
+            raise ValueError("A mirror with no transmission has no transfer matrix, use it as the load of the chain")
+
+        wavelength = np.asarray(wavelength, dtype=np.float64)
+        matrix = np.array([[1, self.r], [self.r, self.t**2 + self.r**2]], dtype=np.complex128) / self.t
+        return np.broadcast_to(matrix, wavelength.shape + (2, 2))
+
+
+class Space():
+    def __init__(self, length) -> None:
+        self.length = length
+
+    def diagonal(self, wavelength, displacement=0):
+        # The matrix is diagonal, these are its two entries.
+        # displacement is added to the length, this is how a moving mirror enters a chain
+        wavelength = np.asarray(wavelength, dtype=np.float64)
+        phase = 2*np.pi * (self.length + np.asarray(displacement, dtype=np.float64)) / wavelength
+
+        forward = np.exp(1j*phase)
+        return forward, np.conj(forward)
+
+    def matrix(self, wavelength, displacement=0):
+        forward, backward = self.diagonal(wavelength, displacement)
+
+        matrix = np.zeros(forward.shape + (2, 2), dtype=np.complex128)
+        matrix[..., 0, 0] = forward
+        matrix[..., 1, 1] = backward
+        return matrix
+
+
+
+def multiply(a, b):
+    # Stacks of 2x2 matrices multiplied entry by entry, np.matmul has a large
+    # overhead per matrix when they are this small
+    matrix = np.empty(np.broadcast_shapes(a.shape, b.shape), dtype=np.complex128)
+    for i in range(2):
+        for j in range(2):
+            matrix[..., i, j] = a[..., i, 0] * b[..., 0, j] + a[..., i, 1] * b[..., 1, j]
+    return matrix
+
+
+def chain_response(matrix, load):
+    # Light enters a chain from the left and its far end reflects with amplitude load.
+    # Returns the reflected field and the forward field reaching the far end, per unit input
+    denominator = matrix[..., 0, 0] + matrix[..., 0, 1] * load
+    return (matrix[..., 1, 0] + matrix[..., 1, 1] * load) / denominator, 1 / denominator
+
+
+class Chain():
+    def __init__(self, components, moving=None) -> None:
+        self.components = components
+        self.moving = moving # index of the Space whose length changes, None if nothing moves
+
+        self.static_cache = OrderedDict()
+
+    def product(self, components, wavelength):
+        # None for no components rather than a stack of identities
+        matrix = None
+        for component in components:
+            matrix = component.matrix(wavelength) if matrix is None else multiply(matrix, component.matrix(wavelength))
+        return matrix
+
+    def static_matrices(self, wavelength):
+        # Products of the components before and after the moving one, kept in a small LRU cache
+        # per wavelength array, None where there are no components
+        key = (wavelength.shape, wavelength.tobytes())
+        matrices = self.static_cache.get(key)
+        if matrices is None:
+            if self.moving is None:
+                matrices = (self.product(self.components, wavelength), None)
+            else:
+                matrices = (self.product(self.components[:self.moving], wavelength), self.product(self.components[self.moving + 1:], wavelength))
+
+            self.static_cache[key] = matrices
+            if len(self.static_cache) > STATIC_CACHE_SIZE:
+                self.static_cache.popitem(last=False)
+        else:
+            self.static_cache.move_to_end(key)
+
+        return matrices
+
+    def matrix(self, wavelength, displacement=0):
+        wavelength = np.asarray(wavelength, dtype=np.float64)
+        before, after = self.static_matrices(wavelength)
+        if self.moving is None:
+            return before
+
+        forward, backward = self.components[self.moving].diagonal(wavelength, displacement)
+        if before is None:
+            matrix = self.components[self.moving].matrix(wavelength, displacement)
+        else:
+            # Multiplying by the diagonal moving space only scales the columns of before
+            matrix = np.empty(forward.shape + (2, 2), dtype=np.complex128)
+            matrix[..., :, 0] = before[..., :, 0] * forward[..., None]
+            matrix[..., :, 1] = before[..., :, 1] * backward[..., None]
+
+        if after is not None:
+            matrix = multiply(matrix, after)
+        return matrix
+
+    def response(self, wavelength, load, displacement=0):
+        return chain_response(self.matrix(wavelength, displacement), load)
+
+    def clear_cache(self):
+        # Needed after changing a static component
+        self.static_cache.clear()
+
+
+
+class CavityEngine(InterferometerEngine):
+    # Michelson whose arms are Fabry-Perot cavities, with optional power recycling.
+    # The input mirrors sit at the beam splitter and the draggable mirrors are the
+    # end mirrors, so the cavity lengths are the arm path distances.
+    # Like InterferometerEngine the detector is dark when the arm lengths are equal,
+    # the rest of the light goes back towards the laser, where a power recycling
+    # mirror can send it back in.
+    def __init__(self, wavelength, amplitude, centre=(400, 400), scale=PATH_SCALE, input_reflectivity=0.986, end_reflectivity=1, loss=0, recycling_reflectivity=None, recycling_length=0) -> None:
+        super().__init__(wavelength, amplitude, centre, scale)
+
+        self.top_arm = Chain([PartialMirror(input_reflectivity, loss), Space(0)], moving=1)
+        self.right_arm = Chain([PartialMirror(input_reflectivity, loss), Space(0)], moving=1)
+        self.end_mirror = PartialMirror(end_reflectivity, loss)
+
+        self.recycling = None
+        if recycling_reflectivity is not None:
+            self.recycling = Chain([PartialMirror(recycling_reflectivity, loss), Space(recycling_length)])
+
+    def arm_reflections(self, top_path, right_path, wavelength=None):
+        if wavelength is None:
+            wavelength = self.wavelength
+
+        top_reflection, _ = self.top_arm.response(wavelength, self.end_mirror.r, top_path)
+        right_reflection, _ = self.right_arm.response(wavelength, self.end_mirror.r, right_path)
+        return top_reflection, right_reflection
+
+    def detector_power(self, top_path, right_path, wavelength=None):
+        # Power reaching the detector per unit input power
+        if wavelength is None:
+            wavelength = self.wavelength
+
+        top_reflection, right_reflection = self.arm_reflections(top_path, right_path, wavelength)
+
+        field = 1
+        if self.recycling is not None:
+            # The Michelson acts as the far mirror of the recycling cavity
+            _, field = self.recycling.response(wavelength, (top_reflection + right_reflection) / 2)
+
+        return np.abs(field * (top_reflection - right_reflection) / 2)**2
+
+    def evaluate_paths(self, top_path, right_path):
+        top_path = np.asarray(top_path, dtype=np.float64)
+        right_path = np.asarray(right_path, dtype=np.float64)
+
+        power = self.detector_power(top_path, right_path)
+        return Response(self.path_difference(top_path, right_path), power, self.intensity(power))
+
+    def broadband_intensity(self, top_path, right_path, spectrum):
+        # Every spectral line in one batched evaluation, then an incoherent sum
+        top_path = np.asarray(top_path, dtype=np.float64)[..., None]
+        right_path = np.asarray(right_path, dtype=np.float64)[..., None]
+        return self.intensity(self.detector_power(top_path, right_path, spectrum.wavelengths)) @ spectrum.weights
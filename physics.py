@@ -0,0 +1,97 @@
+import numpy as np
+from collections import namedtuple
+
+# Headless interferometer physics. Nothing in here touches pygame, so it can be
+# used from scripts and worker processes as well as from the GUI in main.py.
+# Every function accepts scalars or NumPy arrays and broadcasts.
+
+PATH_SCALE = 8000 # nanometres of path per pixel of mirror displacement
+
+Response = namedtuple("Response", ["path_difference", "phase_difference", "intensity"])
+
+
+
+def arm_path_distance(position, centre, drag_axis, scale=PATH_SCALE):
+    # Distance from the splitter to a mirror along its arm
+    # drag_axis 0 is the right arm (x increases away), 1 is the top arm (y decreases away)
+    position = np.asarray(position, dtype=np.float64)
+    if drag_axis == 0:
+        return (position - centre) * scale
+    return (centre - position) * scale
+
+
+def end_phase(path_distance, wavelength):
+    # Phase of the light when it reaches the end of a path of the given length
+    return np.mod(path_distance, wavelength) / wavelength * 2*np.pi
+
+
+class InterferometerEngine():
+    def __init__(self, wavelength, amplitude, centre=(400, 400), scale=PATH_SCALE) -> None:
+        self.wavelength = wavelength
+        self.amplitude = amplitude
+
+        self.centre = centre # position of the beam splitter in pixels
+        self.scale = scale
+
+    def path_distances(self, top_pos, right_pos):
+        # top_pos are y positions of the top mirror, right_pos x positions of the right mirror
+        top_path = arm_path_distance(top_pos, self.centre[1], 1, self.scale)
+        right_path = arm_path_distance(right_pos, self.centre[0], 0, self.scale)
+        return top_path, right_path
+
+    def path_difference(self, top_path, right_path):
+        # Light travels each arm twice
+        top_path = np.asarray(top_path, dtype=np.float64)
+        right_path = np.asarray(right_path, dtype=np.float64)
+
+        return np.abs(2*top_path - 2*right_path)
+
+    def phase_difference(self, path_difference, wavelength=None):
+        if wavelength is None:
+            wavelength = self.wavelength
+
+        # Triangle wave of the fractional wavelength, 1 if in phase, 0 if not
+        return np.abs(np.abs(np.mod(path_difference, wavelength) / wavelength - 0.5) - 0.5) * 2
+
+    def intensity(self, phase_difference):
+        return phase_difference * self.amplitude * 2
+
+    def evaluate_paths(self, top_path, right_path):
+        path_difference = self.path_difference(top_path, right_path)
+        phase_difference = self.phase_difference(path_difference)
+        return Response(path_difference, phase_difference, self.intensity(phase_difference))
+
+    def evaluate(self, top_pos, right_pos):
+        return self.evaluate_paths(*self.path_distances(top_pos, right_pos))
+
+    def broadband_intensity(self, top_path, right_path, spectrum):
+        return broadband_intensity(self, self.path_difference(top_path, right_path), spectrum)
+
+
+
+class Spectrum():
+    # A light source made of many wavelengths, each with a relative weight
+    def __init__(self, wavelengths, weights=None) -> None:
+        self.wavelengths = np.asarray(wavelengths, dtype=np.float64).ravel()
+        if weights is None:
+            weights = np.ones_like(self.wavelengths)
+
+        weights = np.asarray(weights, dtype=np.float64).ravel()
+        self.weights = weights / weights.sum()
+
+
+def gaussian_spectrum(centre, width, lines=101):
+    # width is the standard deviation in nm, sampled over +-3 widths
+    wavelengths = np.linspace(centre - 3*width, centre + 3*width, lines)
+    return Spectrum(wavelengths, np.exp(-0.5 * ((wavelengths - centre) / width)**2))
+
+
+def white_light_spectrum(start=400, stop=700, lines=301):
+    return Spectrum(np.linspace(start, stop, lines))
+
+
+def broadband_intensity(engine, path_difference, spectrum):
+    # Incoherent sum of the intensity of every spectral line, weighted by its power
+    path_difference = np.asarray(path_difference, dtype=np.float64)
+    phase_difference = engine.phase_difference(path_difference[..., None], spectrum.wavelengths)
+    return engine.intensity(phase_difference) @ spectrum.weights
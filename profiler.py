@@ -0,0 +1,90 @@
+import json
+import threading
+import numpy as np
+from time import perf_counter_ns
+
+from buffers import RingBuffer
+
+# Per stage timing of the main loop. Each stage keeps its most recent
+# (start, duration) pairs in a fixed size ring buffer, so profiling costs the
+# same however long the program runs. write_trace saves them in the Chrome
+# trace event format, which chrome://tracing and Perfetto can open.
+# Stages can be timed from several threads, in threaded mode the simulation and
+# drawing threads share one profiler, so everything shared is locked.
+
+
+
+class Stage():
+    def __init__(self, name, capacity, origin) -> None:
+        self.name = name
+        self.timings = RingBuffer(2, capacity, grow=False) # rows of (start, duration) in nanoseconds
+        self.origin = origin # starts are stored relative to this so they stay exact as floats
+        self.lock = threading.Lock()
+        self.local = threading.local() # start time of the thread inside the stage
+
+    def __enter__(self):
+        self.local.start = perf_counter_ns()
+        return self
+
+    def __exit__(self, *exception):
+        end = perf_counter_ns()
+        with self.lock:
+            self.timings.append((self.local.start - self.origin, end - self.local.start))
+        return False
+
+    def array(self):
+        # Copy of the (start, duration) rows
+        with self.lock:
+            return self.timings.array().copy()
+
+    def percentiles(self, percentiles=(50, 99)):
+        # Durations in milliseconds
+        durations = self.array()[:, 1]
+        if len(durations) == 0:
+            return [0] * len(percentiles)
+        return (np.percentile(durations, percentiles) / 1e6).tolist()
+
+    def clear(self):
+        with self.lock:
+            self.timings.clear()
+
+
+
+class StageProfiler():
+    def __init__(self, capacity=4096) -> None:
+        self.capacity = capacity
+        self.stages = {}
+        self.origin = perf_counter_ns()
+        self.lock = threading.Lock() # guards adding stages
+
+    def stage(self, name):
+        # Use as "with profiler.stage(name):" around the code to time
+        stage = self.stages.get(name)
+        if stage is None:
+            with self.lock:
+                stage = self.stages.setdefault(name, Stage(name, self.capacity, self.origin))
+        return stage
+
+    def stage_list(self):
+        with self.lock:
+            return list(self.stages.items())
+
+    def summary(self):
+        # (name, p50, p99) for every stage, in milliseconds
+        return [(name, *stage.percentiles()) for name, stage in self.stage_list()]
+
+    def clear(self):
+        for name, stage in self.stage_list():
+            stage.clear()
+
+    def write_trace(self, path):
+        events = []
+        for tid, (name, stage) in enumerate(self.stage_list()):
+            # Each stage gets its own row in the viewer
+            events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": name}})
+
+            for start, duration in stage.array().tolist():
+                events.append({"name": name, "ph": "X", "pid": 1, "tid": tid, "ts": start / 1000, "dur": duration / 1000})
+
+        with open(path, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
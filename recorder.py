@@ -0,0 +1,174 @@
+import json
+import queue
+import struct
+import threading
+import numpy as np
+
+# Binary recording of samples. Rows are collected into chunks on the calling
+# thread and a background thread appends each full chunk to the file, so
+# recording never blocks on disk. Clearing and exporting are queued to the same
+# thread, so they happen in order with the writes. Files are a small header followed by raw
+# little endian float64 rows, which load_recording memory maps without copying.
+
+MAGIC = b"IFREC001"
+HEADER_ALIGNMENT = 64
+
+RECORDING_COLUMNS = ("time", "top_mirror", "right_mirror", "phase_difference", "intensity")
+
+
+
+def write_header(file, columns):
+    header = json.dumps({"columns": list(columns), "dtype": "<f8"}).encode()
+
+    # Pad so the rows start on an aligned offset
+    length = len(MAGIC) + 4 + len(header)
+    header += b" " * (-length % HEADER_ALIGNMENT)
+
+    file.write(MAGIC)
+    file.write(struct.pack("<I", len(header)))
+    file.write(header)
+
+
+def read_header(file):
+    if file.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a recording file")
+
+    header_length, = struct.unpack("<I", file.read(4))
+    header = json.loads(file.read(header_length))
+    return header, len(MAGIC) + 4 + header_length
+
+
+def load_recording(path):
+    # Memory maps a recording as a structured array, one field per column
+    with open(path, "rb") as file:
+        header, offset = read_header(file)
+        file.seek(0, 2)
+        size = file.tell()
+
+    dtype = np.dtype([(name, header["dtype"]) for name in header["columns"]])
+    rows = (size - offset) // dtype.itemsize
+    if rows == 0:
+        return np.zeros(0, dtype=dtype)
+
+    return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(rows,))
+
+
+def export_text(path, text_path, columns=("time", "intensity"), rows=None):
+    # Writes the chosen columns of the first rows, or all of them, as "Name: value" text, like the old data.txt
+    recording = load_recording(path)[:rows]
+    names = [name.replace("_", " ").capitalize() for name in columns]
+
+    with open(text_path, "w") as data:
+        for row in zip(*(recording[name].tolist() for name in columns)):
+            data.write("         ".join(f"{name}: {round(value, 6)}" for name, value in zip(names, row)) + "\n")
+
+
+
+class DataRecorder():
+    def __init__(self, path, columns=RECORDING_COLUMNS, chunk_rows=4096, queue_size=64) -> None:
+        self.path = path
+        self.columns = tuple(columns)
+        self.chunk_rows = chunk_rows
+
+        self.chunk = np.empty((chunk_rows, len(self.columns)), dtype="<f8")
+        self.chunk_length = 0
+        self.rows = 0
+
+        # Bounded so a slow disk holds back the producer instead of using up memory
+        self.queue = queue.Queue(maxsize=queue_size)
+
+        self.file = open(self.path, "wb")
+        write_header(self.file, self.columns)
+        self.file.flush()
+        self.header_length = self.file.tell()
+
+        # Only touched by the writer thread
+        self.written_rows = 0
+        self.export_thread = None
+
+        self.writer = threading.Thread(target=self.write_chunks, daemon=True)
+        self.writer.start()
+
+    def write_chunks(self):
+        # Each item is a chunk of rows, a function to run in order with them, or None to stop
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                if callable(item):
+                    item()
+                else:
+                    item.tofile(self.file)
+                    self.file.flush()
+                    self.written_rows += len(item)
+            finally:
+                self.queue.task_done()
+
+    def truncate(self):
+        # Waits for an export still reading the file, then drops every row
+        if self.export_thread is not None:
+            self.export_thread.join()
+        self.file.seek(self.header_length)
+        self.file.truncate()
+        self.file.flush()
+        self.written_rows = 0
+
+    def start_export(self, text_path, columns):
+        # Exports the rows written so far, later rows are appended without disturbing it
+        if self.export_thread is not None:
+            self.export_thread.join()
+        self.export_thread = threading.Thread(target=export_text, args=(self.path, text_path, columns, self.written_rows), daemon=True)
+        self.export_thread.start()
+
+    def record(self, row):
+        self.chunk[self.chunk_length] = row
+        self.chunk_length += 1
+        self.rows += 1
+
+        if self.chunk_length == self.chunk_rows:
+            self.flush()
+
+    def record_block(self, rows):
+        # Many rows at once, copied into the chunks a slice at a time
+        rows = np.asarray(rows, dtype="<f8").reshape(-1, len(self.columns))
+        start = 0
+        while start < len(rows):
+            n = min(len(rows) - start, self.chunk_rows - self.chunk_length)
+            self.chunk[self.chunk_length:self.chunk_length + n] = rows[start:start + n]
+            self.chunk_length += n
+            self.rows += n
+            start += n
+
+            if self.chunk_length == self.chunk_rows:
+                self.flush()
+
+    def flush(self):
+        # Hands the rows collected so far to the writer thread
+        if self.chunk_length:
+            self.queue.put(self.chunk[:self.chunk_length])
+            self.chunk = np.empty((self.chunk_rows, len(self.columns)), dtype="<f8")
+            self.chunk_length = 0
+
+    def clear(self):
+        # Drops every row recorded so far without waiting for the disk
+        self.chunk_length = 0
+        self.rows = 0
+        self.queue.put(self.truncate)
+
+    def export(self, text_path, columns=("time", "intensity")):
+        # Writes the rows recorded so far as text on another thread, see export_text
+        self.flush()
+        self.queue.put(lambda: self.start_export(text_path, columns))
+
+    def wait(self):
+        # Blocks until everything flushed so far is on disk
+        self.queue.join()
+
+    def close(self):
+        self.flush()
+        self.queue.put(None)
+        self.writer.join()
+        if self.export_thread is not None:
+            self.export_thread.join()
+        self.file.close()
@@ -0,0 +1,70 @@
+import os
+import sys
+import time
+import hashlib
+import argparse
+
+# Replays a session logged with "python main.py --record-session PATH".
+# Without --render it runs headless as fast as the CPU allows, and the graph
+# and recording it produces are bit-identical to the original session.
+#
+# python replay.py session.ifs --output replay.ifr [--render]
+
+
+
+def replay(session_path, output, render=False):
+    if not render:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+    import pygame
+    import main as app
+    from recorder import DataRecorder
+    from session import read_session
+
+    app.setup()
+
+    header, frames = read_session(session_path)
+    if header["physics_rate"] != app.PHYSICS_RATE:
+        raise ValueError(f"Session was recorded at {header['physics_rate']} Hz physics, this build runs at {app.PHYSICS_RATE} Hz")
+
+    # Resets with R clear this recording, as in the GUI
+    app.recorder = DataRecorder(output)
+
+    n_frames = 0
+    for delta_time, events in frames:
+        app.simulate_frame(delta_time, events)
+        n_frames += 1
+
+        if render:
+            app.fps_label.text = f"Replay frame {n_frames}"
+            app.draw_frame()
+            pygame.display.update()
+            pygame.event.pump()
+
+    app.recorder.close()
+    return app, n_frames
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a logged interferometer session")
+    parser.add_argument("session", help="session log written with --record-session")
+    parser.add_argument("--output", default="replay.ifr", help="recording file for the replayed samples")
+    parser.add_argument("--render", action="store_true", help="draw every frame, slower")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    app, n_frames = replay(args.session, args.output, args.render)
+    elapsed = time.perf_counter() - start
+
+    simulated = app.scheduler.steps * app.scheduler.step_time
+    print(f"{n_frames} frames, {simulated:.2f} s simulated in {elapsed:.2f} s ({simulated / max(elapsed, 1e-9):.1f}x real time)")
+
+    # Compare digests between runs to check the physics hasn't changed
+    print(f"graph points sha256 {hashlib.sha256(app.graph.points.array().tobytes()).hexdigest()}")
+    return 0
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
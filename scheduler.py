@@ -0,0 +1,34 @@
+# Fixed timestep scheduling. Physics always advances in steps of exactly
+# 1 / rate seconds however long each rendered frame takes, so results only
+# depend on the number of steps and not on the display.
+
+
+
+class FixedStepScheduler():
+    def __init__(self, rate=1000, max_steps=250) -> None:
+        self.rate = rate
+        self.step_time = 1 / rate
+
+        # Caps the steps run after a long stall so the simulation can't spiral behind
+        self.max_steps = max_steps
+
+        self.accumulator = 0
+        self.steps = 0 # total steps taken
+
+    def advance(self, frame_time):
+        # Returns how many steps to run for this frame
+        self.accumulator = min(self.accumulator + frame_time, self.max_steps * self.step_time)
+
+        steps = int(self.accumulator / self.step_time)
+        self.accumulator -= steps * self.step_time
+        self.steps += steps
+        return steps
+
+    @property
+    def alpha(self):
+        # How far between the last two physics states the frame is drawn, 0 to 1
+        return min(1, self.accumulator / self.step_time)
+
+    def reset(self):
+        self.accumulator = 0
+        self.steps = 0
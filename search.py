@@ -0,0 +1,311 @@
+import os
+import sys
+import argparse
+import numpy as np
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from strain import ChirpStrain
+from spectral import WelchEstimator
+from recorder import load_recording
+
+# Matched filter search of recorded detector output for inspiral chirps.
+# The data is cut into overlapping segments (overlap-save), each segment is
+# transformed once, and every template's correlation with it is one multiply
+# and one inverse FFT. Only positive frequencies are kept, so the result is
+# complex and its magnitude is the SNR maximised over the chirp's phase.
+#
+# The bank is split into one chunk per worker process and each worker keeps
+# its chunk's whitened template spectra between segments, so templates are
+# only generated and transformed once per run. Data can be pushed in blocks of
+# any size as it arrives, triggers come out as soon as they are final.
+#
+# python search.py data.ifr --min-mass 1 --max-mass 10 --templates 1000
+
+SPECTRA_CACHE_SIZE = 2
+BATCH_SIZE = 16 # templates per inverse FFT call, bounds the workers' memory
+
+Trigger = namedtuple("Trigger", ["time", "snr", "chirp_mass"])
+
+
+
+class TemplateBank():
+    def __init__(self, chirp_masses, sample_rate, start_frequency=50, max_frequency=1000, length=None) -> None:
+        # chirp_masses in solar masses, frequencies in Hz, length in samples defaults to the longest template's
+        if sample_rate / 2 <= start_frequency:
+            raise ValueError(f"A sample rate of {sample_rate:g} Hz only holds frequencies up to {sample_rate / 2:g} Hz, below the {start_frequency:g} Hz the chirps start at")
+
+        self.chirp_masses = np.asarray(chirp_masses, dtype=np.float64)
+        self.sample_rate = sample_rate
+        self.start_frequency = start_frequency
+        self.max_frequency = min(max_frequency, sample_rate / 2)
+
+        self.templates = [ChirpStrain(1, mass, self.start_frequency, self.max_frequency) for mass in self.chirp_masses]
+
+        # The lightest chirp is the longest, every template is padded to its length
+        self.length = length or int(np.ceil(max(template.end_time() for template in self.templates) * sample_rate)) + 1
+
+        self.spectra_cache = OrderedDict()
+
+    def __len__(self):
+        return len(self.templates)
+
+    def split(self, parts):
+        # Banks of neighbouring masses for the workers, padded like this one so their mergers line up with it
+        return [TemplateBank(masses, self.sample_rate, self.start_frequency, self.max_frequency, self.length) for masses in np.array_split(self.chirp_masses, parts) if len(masses)]
+
+    def waveforms(self):
+        # Shape (templates, length), each ending at the same sample so every template's merger lines up
+        waveforms = np.zeros((len(self), self.length))
+        for i, template in enumerate(self.templates):
+            t = np.arange(int(template.end_time() * self.sample_rate) + 1) / self.sample_rate
+            waveforms[i, self.length - len(t):] = template.strain(t)
+        return waveforms
+
+    def spectra(self, segment_length, band, psd):
+        # Conjugated template spectra over the band, whitened by the one sided psd there and normalised
+        # so the magnitude of the filter output is the SNR. Kept in a small LRU cache.
+        key = (segment_length, band, psd.tobytes())
+        spectra = self.spectra_cache.get(key)
+        if spectra is None:
+            spectra = np.fft.rfft(self.waveforms(), segment_length, axis=1)[:, band[0]:band[1]]
+
+            # Expected |FFT|^2 of a segment of noise, and the variance of the real part
+            # of the output for it, 2/N^2 sum |H|^2 / power
+            power = psd * segment_length * self.sample_rate / 2
+            sigma = np.sqrt(2 * np.sum(np.abs(spectra)**2 / power, axis=1)) / segment_length
+            spectra = (2 * np.conj(spectra) / power / sigma[:, None]).astype(np.complex64)
+
+            self.spectra_cache[key] = spectra
+            if len(self.spectra_cache) > SPECTRA_CACHE_SIZE:
+                self.spectra_cache.popitem(last=False)
+        else:
+            self.spectra_cache.move_to_end(key)
+
+        return spectra
+
+    def filter(self, data_spectrum, segment_length, band, psd, valid):
+        # Best SNR over the bank and the template giving it, for the first valid lags of a segment
+        spectra = self.spectra(segment_length, band, psd)
+
+        products = np.zeros((min(BATCH_SIZE, len(self)), segment_length), dtype=np.complex64)
+        best_snr = np.zeros(valid, dtype=np.float32)
+        best_template = np.zeros(valid, dtype=np.int32)
+
+        for start in range(0, len(self), BATCH_SIZE):
+            batch = spectra[start:start + BATCH_SIZE]
+            np.multiply(batch, data_spectrum, out=products[:len(batch), band[0]:band[1]])
+            snr = np.abs(np.fft.ifft(products[:len(batch)], axis=1)[:, :valid])
+
+            template = np.argmax(snr, axis=0)
+            snr = snr[template, np.arange(valid)]
+            better = snr > best_snr
+            best_snr[better] = snr[better]
+            best_template[better] = template[better] + start
+
+        return best_snr, best_template
+
+
+
+# Each worker process holds one chunk of the bank for the whole search
+worker_bank = None
+
+def start_worker(bank):
+    global worker_bank
+    worker_bank = bank
+
+def filter_segment(data_spectrum, segment_length, band, psd, valid):
+    return worker_bank.filter(data_spectrum, segment_length, band, psd, valid)
+
+
+
+def next_power_of_two(n):
+    return 1 << (int(n) - 1).bit_length()
+
+
+def estimate_psd(samples, sample_rate, frequencies, segment_seconds=1):
+    # Welch estimate interpolated onto the segment frequencies. Short Welch segments average many
+    # of them, a noisy estimate would inflate the SNR of noise. Floored so silent bins can't divide by zero
+    estimator = WelchEstimator(sample_rate, segment_length=min(len(samples), next_power_of_two(segment_seconds * sample_rate)))
+    estimator.push(samples)
+    psd = np.interp(frequencies, estimator.frequencies, estimator.psd())
+    return np.maximum(psd, 1e-12 * max(psd.max(), 1e-300))
+
+
+
+class MatchedFilterSearch():
+    def __init__(self, bank, threshold=8, cluster_time=1, segment_length=None, psd=None, workers=None, start_time=0) -> None:
+        # psd is the one sided noise PSD at np.fft.rfftfreq(segment_length, 1 / sample_rate),
+        # by default it is estimated from the first segment and kept for the rest of the run
+        self.bank = bank
+        self.sample_rate = bank.sample_rate
+        self.threshold = threshold
+        self.cluster_samples = max(1, int(round(cluster_time * self.sample_rate)))
+
+        # Segments at least twice the longest template, each one gives this many new lags
+        self.segment_length = segment_length or next_power_of_two(2 * bank.length)
+        if self.segment_length <= bank.length:
+            raise ValueError(f"Segments of {self.segment_length} samples can't hold templates of {bank.length}")
+        self.step = self.segment_length - bank.length + 1
+
+        self.frequencies = np.fft.rfftfreq(self.segment_length, 1 / self.sample_rate)
+        self.band = (int(np.searchsorted(self.frequencies, bank.start_frequency)), int(np.searchsorted(self.frequencies, bank.max_frequency, "right")))
+        self.psd = None if psd is None else np.asarray(psd, dtype=np.float64)[self.band[0]:self.band[1]]
+
+        # A single process executor per chunk of the bank, so each chunk stays cached in its own worker
+        chunks = bank.split(workers or os.cpu_count())
+        self.pools = [ProcessPoolExecutor(max_workers=1, initializer=start_worker, initargs=(chunk,)) for chunk in chunks]
+        self.offsets = np.cumsum([0] + [len(chunk) for chunk in chunks])[:-1]
+
+        self.start_time = start_time
+        self.data = np.empty(0) # samples not yet covered by a whole segment
+        self.data_start = 0 # stream index of data[0]
+
+        # (loudest trigger, last sample above threshold) of the cluster that could still grow, None if there isn't one
+        self.cluster = None
+        self.last_merger = None # set by flush, mergers after the end of the data are ignored
+
+    def push(self, samples):
+        # Appends samples to the stream, returns the triggers finalised by them, oldest first
+        self.data = np.concatenate((self.data, np.asarray(samples, dtype=np.float64).ravel()))
+
+        segments = max(0, (len(self.data) - self.segment_length) // self.step + 1)
+        if segments == 0:
+            return []
+
+        if self.psd is None:
+            self.psd = estimate_psd(self.data[:self.segment_length], self.sample_rate, self.frequencies)[self.band[0]:self.band[1]]
+
+        # Every segment goes to every worker before any result is collected
+        futures = []
+        for segment in range(segments):
+            start = segment * self.step
+            data_spectrum = np.fft.rfft(self.data[start:start + self.segment_length])[self.band[0]:self.band[1]].astype(np.complex64)
+            futures.append([pool.submit(filter_segment, data_spectrum, self.segment_length, self.band, self.psd, self.step) for pool in self.pools])
+
+        triggers = []
+        for segment, segment_futures in enumerate(futures):
+            best_snr = np.zeros(self.step, dtype=np.float32)
+            best_template = np.zeros(self.step, dtype=np.int32)
+            for future, offset in zip(segment_futures, self.offsets):
+                snr, template = future.result()
+                better = snr > best_snr
+                best_snr[better] = snr[better]
+                best_template[better] = template[better] + offset
+
+            # Lag k of a segment puts the merger at sample start + k + length - 1 of the stream
+            first_merger = self.data_start + segment * self.step + self.bank.length - 1
+            triggers += self.cluster_triggers(first_merger, best_snr, best_template)
+
+        self.data = self.data[segments * self.step:]
+        self.data_start += segments * self.step
+        return triggers
+
+    def cluster_triggers(self, first_merger, snr, template):
+        # Samples above threshold within cluster_time of the last one join its cluster and
+        # only the loudest of each cluster is reported. Returns the clusters that can't grow any more.
+        above = np.flatnonzero(snr >= self.threshold)
+        if self.last_merger is not None:
+            above = above[first_merger + above <= self.last_merger]
+
+        triggers = []
+        for lags in np.split(above, np.flatnonzero(np.diff(above) > self.cluster_samples) + 1):
+            if len(lags) == 0:
+                continue
+
+            if self.cluster is not None and first_merger + lags[0] - self.cluster[1] > self.cluster_samples:
+                triggers.append(self.cluster[0])
+                self.cluster = None
+
+            lag = lags[np.argmax(snr[lags])]
+            loudest = self.cluster[0] if self.cluster is not None else None
+            if loudest is None or snr[lag] > loudest.snr:
+                loudest = Trigger(float(self.start_time + (first_merger + lag) / self.sample_rate), float(snr[lag]), float(self.bank.chirp_masses[template[lag]]))
+            self.cluster = (loudest, first_merger + lags[-1])
+
+        # The next segment starts at first_merger + step
+        if self.cluster is not None and first_merger + len(snr) - self.cluster[1] > self.cluster_samples:
+            triggers.append(self.cluster[0])
+            self.cluster = None
+
+        return triggers
+
+    def flush(self):
+        # Ends the stream, searching its last samples by padding it to a whole segment with
+        # their mean, so the edge doesn't ring, and returns every remaining trigger
+        triggers = []
+        if len(self.data) >= self.bank.length:
+            self.last_merger = self.data_start + len(self.data) - 1
+            triggers = self.push(np.full(self.segment_length - len(self.data), self.data.mean()))
+
+        if self.cluster is not None:
+            triggers.append(self.cluster[0])
+            self.cluster = None
+        return triggers
+
+    def close(self):
+        for pool in self.pools:
+            pool.shutdown()
+
+
+
+def search(times, values, bank, block_time=60, **options):
+    # Runs a whole recording through a search in blocks, like data arriving live
+    search = MatchedFilterSearch(bank, start_time=float(times[0]) if len(times) else 0, **options)
+    block = max(1, int(block_time * bank.sample_rate))
+    try:
+        triggers = []
+        for start in range(0, len(values), block):
+            triggers += search.push(values[start:start + block])
+        return triggers + search.flush()
+    finally:
+        search.close()
+
+
+def sample_rate_of(times):
+    # Rows are evenly spaced, like Graph.points and data recordings
+    if len(times) < 2 or times[-1] <= times[0]:
+        raise ValueError(f"Need at least 2 samples at increasing times to find the sample rate, got {len(times)}")
+    return (len(times) - 1) / (times[-1] - times[0])
+
+
+def search_rows(rows, chirp_masses, start_frequency=50, max_frequency=1000, **options):
+    # (time, value) rows, from Graph.points.array() for example
+    rows = np.asarray(rows, dtype=np.float64)
+    bank = TemplateBank(chirp_masses, sample_rate_of(rows[:, 0]), start_frequency, max_frequency)
+    return search(rows[:, 0], rows[:, 1], bank, **options)
+
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Matched filter search of a data recording for chirps")
+    parser.add_argument("recording", help=".ifr recording made by main.py")
+    parser.add_argument("--column", default="intensity", help="recording column to search")
+    parser.add_argument("--sample-rate", type=float, default=None, help="samples per second, by default from the time column")
+    parser.add_argument("--min-mass", type=float, default=1, help="lightest chirp mass in solar masses")
+    parser.add_argument("--max-mass", type=float, default=10, help="heaviest chirp mass in solar masses")
+    parser.add_argument("--templates", type=int, default=1000, help="templates, evenly spaced in log chirp mass")
+    parser.add_argument("--start-frequency", type=float, default=50, help="lowest frequency searched in Hz")
+    parser.add_argument("--max-frequency", type=float, default=1000, help="highest frequency searched in Hz")
+    parser.add_argument("--threshold", type=float, default=8, help="SNR reported")
+    parser.add_argument("--cluster-time", type=float, default=1, help="seconds within which only the loudest trigger is kept")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, defaults to the number of cores")
+    args = parser.parse_args(argv)
+
+    recording = load_recording(args.recording)
+    times = np.asarray(recording["time"])
+    try:
+        sample_rate = args.sample_rate or sample_rate_of(times)
+        bank = TemplateBank(np.geomspace(args.min_mass, args.max_mass, args.templates), sample_rate, args.start_frequency, args.max_frequency)
+    except ValueError as error:
+        parser.error(f"{args.recording}: {error}")
+    triggers = search(times, np.asarray(recording[args.column]), bank, threshold=args.threshold, cluster_time=args.cluster_time, workers=args.workers)
+    for trigger in triggers:
+        print(f"t = {trigger.time:.4f} s  SNR {trigger.snr:.2f}  chirp mass {trigger.chirp_mass:.3f}")
+    print(f"{len(triggers)} triggers")
+    return 0
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
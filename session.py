@@ -0,0 +1,116 @@
+import json
+import struct
+import pygame
+
+# Compact binary log of everything that drives the simulation: each frame's
+# delta time and the input events handled in it. Replaying a log through the
+# same frame function gives bit-identical results, since physics only depends
+# on these inputs. Quitting isn't logged, a log simply ends, and neither are
+# keys that only write files, so a replay never overwrites the user's exports.
+# Each frame is flushed as it is written, so a crash keeps the log up to it.
+#
+# Each event is a one byte kind followed by its fields, and a frame record ends
+# the events of its frame:
+#   F  delta time (float64)
+#   K  key (int32)
+#   D  mouse button down, button (uint8), x, y (int16)
+#   U  mouse button up, button (uint8), x, y (int16)
+#   M  mouse motion, x, y (int16)
+#   W  mouse wheel, steps (int32)
+
+MAGIC = b"IFSES001"
+
+FRAME = struct.Struct("<cd")
+KEY = struct.Struct("<ci") # also used for wheel steps
+BUTTON = struct.Struct("<cBhh")
+MOTION = struct.Struct("<chh")
+
+# Escape quits, S saves data.txt and T writes trace.json
+UNLOGGED_KEYS = (pygame.K_ESCAPE, pygame.K_s, pygame.K_t)
+
+
+
+class SessionWriter():
+    def __init__(self, path, physics_rate) -> None:
+        self.file = open(path, "wb")
+
+        header = json.dumps({"physics_rate": physics_rate}).encode()
+        self.file.write(MAGIC)
+        self.file.write(struct.pack("<I", len(header)))
+        self.file.write(header)
+
+    def write_frame(self, delta_time, events):
+        records = []
+        for event in events:
+            if event.type == pygame.KEYDOWN and event.key not in UNLOGGED_KEYS:
+                records.append(KEY.pack(b"K", event.key))
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                records.append(BUTTON.pack(b"D", event.button, *event.pos))
+            elif event.type == pygame.MOUSEBUTTONUP:
+                records.append(BUTTON.pack(b"U", event.button, *event.pos))
+            elif event.type == pygame.MOUSEMOTION:
+                records.append(MOTION.pack(b"M", *event.pos))
+            elif event.type == pygame.MOUSEWHEEL:
+                records.append(KEY.pack(b"W", event.y))
+
+        records.append(FRAME.pack(b"F", delta_time))
+        self.file.write(b"".join(records))
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+
+def read_session(path):
+    # Returns (header, generator of (delta_time, events)) with events rebuilt as pygame events
+    file = open(path, "rb")
+    if file.read(len(MAGIC)) != MAGIC:
+        file.close()
+        raise ValueError("Not a session log")
+
+    header_length, = struct.unpack("<I", file.read(4))
+    header = json.loads(file.read(header_length))
+
+    def frames():
+        with file:
+            data = file.read()
+
+        position = 0
+        events = []
+        sizes = {b"F": FRAME.size, b"K": KEY.size, b"D": BUTTON.size, b"U": BUTTON.size, b"W": KEY.size, b"M": MOTION.size}
+        while position < len(data):
+            kind = data[position:position + 1]
+            if kind in sizes and position + sizes[kind] > len(data):
+                # Cut short by a crash, the log ends at the last whole frame
+                return
+
+            if kind == b"F":
+                delta_time = FRAME.unpack_from(data, position)[1]
+                position += FRAME.size
+                yield delta_time, events
+                events = []
+            elif kind == b"K":
+                key = KEY.unpack_from(data, position)[1]
+                position += KEY.size
+                if key in UNLOGGED_KEYS:
+                    # Logs from before these keys were left out
+                    continue
+                events.append(pygame.event.Event(pygame.KEYDOWN, key=key, mod=0, unicode=""))
+            elif kind in (b"D", b"U"):
+                _, button, x, y = BUTTON.unpack_from(data, position)
+                position += BUTTON.size
+                event_type = pygame.MOUSEBUTTONDOWN if kind == b"D" else pygame.MOUSEBUTTONUP
+                events.append(pygame.event.Event(event_type, button=button, pos=(x, y)))
+            elif kind == b"W":
+                steps = KEY.unpack_from(data, position)[1]
+                position += KEY.size
+                events.append(pygame.event.Event(pygame.MOUSEWHEEL, x=0, y=steps, flipped=False))
+            elif kind == b"M":
+                _, x, y = MOTION.unpack_from(data, position)
+                position += MOTION.size
+                events.append(pygame.event.Event(pygame.MOUSEMOTION, pos=(x, y)))
+            else:
+                raise ValueError(f"Corrupt session log at byte {position}")
+
+    return header, frames()
@@ -0,0 +1,73 @@
+import numpy as np
+
+# Streaming spectral estimation. Samples are pushed in as they arrive and every
+# complete, overlapping segment is windowed and transformed once, Welch style.
+# Only the unfinished tail of the stream and the summed power are kept, so
+# memory and time per sample stay the same however long it runs.
+
+
+
+class WelchEstimator():
+    # decay None averages every segment equally, a value between 0 and 1 weights
+    # each new segment by decay instead, so the estimate follows slow changes
+    def __init__(self, sample_rate, segment_length=1024, overlap=0.5, decay=None) -> None:
+        self.sample_rate = sample_rate
+        self.segment_length = segment_length
+        self.step = max(1, segment_length - int(segment_length * overlap))
+        self.decay = decay
+
+        self.window = np.hanning(segment_length)
+        # Scales |FFT|^2 of a windowed segment to a one sided power spectral density
+        self.scale = 2 / (sample_rate * np.sum(self.window**2))
+
+        self.frequencies = np.fft.rfftfreq(segment_length, 1 / sample_rate)
+        self.reset()
+
+    def reset(self):
+        self.tail = np.empty(0)
+        self.power = np.zeros(len(self.frequencies))
+        self.segments = 0
+
+    def push(self, samples):
+        data = np.concatenate((self.tail, np.asarray(samples, dtype=np.float64).ravel()))
+        if len(data) < self.segment_length:
+            self.tail = data
+            return 0
+
+        segments = np.lib.stride_tricks.sliding_window_view(data, self.segment_length)[::self.step]
+
+        # Remove each segment's mean so the DC level doesn't leak into low frequencies
+        segments = segments - segments.mean(axis=1, keepdims=True)
+        power = np.abs(np.fft.rfft(segments * self.window, axis=1))**2
+
+        if self.decay is None:
+            self.power += power.sum(axis=0)
+        else:
+            for segment_power in power:
+                if self.segments == 0:
+                    self.power[:] = segment_power
+                else:
+                    self.power += self.decay * (segment_power - self.power)
+
+        self.segments += len(segments)
+        self.tail = data[len(segments) * self.step:].copy()
+        return len(segments)
+
+    def psd(self):
+        # Power spectral density in units^2 / Hz
+        if self.segments == 0:
+            return np.zeros(len(self.frequencies))
+
+        psd = self.power * self.scale
+        if self.decay is None:
+            psd /= self.segments
+
+        # DC and Nyquist bins aren't doubled in a one sided spectrum
+        psd[0] /= 2
+        if self.segment_length % 2 == 0:
+            psd[-1] /= 2
+        return psd
+
+    def asd(self):
+        # Amplitude spectral density in units / sqrt(Hz)
+        return np.sqrt(self.psd())
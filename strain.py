@@ -0,0 +1,162 @@
+import numpy as np
+
+# Gravitational wave strain sources. A source turns an array of times into an
+# array of strain h(t); the stream helpers below sample a source in fixed size
+# chunks at a fixed sample rate, so the signal does not depend on the frame rate.
+
+G = 6.674e-11
+C = 299_792_458
+SOLAR_MASS = 1.989e30
+
+
+
+class StrainSource():
+    # Strain at each time in t, subclasses override this
+    def strain(self, t):
+        return np.zeros_like(t)
+
+    # Time after which the source only returns zeros, None if it never ends
+    def end_time(self):
+        return None
+
+
+
+class SinusoidalStrain(StrainSource):
+    def __init__(self, amplitude, frequency, phase=0) -> None:
+        self.amplitude = amplitude
+        self.frequency = frequency
+        self.phase = phase
+
+    def strain(self, t):
+        return self.amplitude * np.cos(2*np.pi * self.frequency * t + self.phase)
+
+
+
+class ChirpStrain(StrainSource):
+    # Leading order (Newtonian) inspiral of a compact binary
+    # amplitude is the strain at start_frequency, the signal ends when it reaches max_frequency
+    def __init__(self, amplitude, chirp_mass, start_frequency, max_frequency, phase=0) -> None:
+        self.amplitude = amplitude
+        self.chirp_mass = chirp_mass # in solar masses
+        self.start_frequency = start_frequency
+        self.max_frequency = max_frequency
+        self.phase = phase
+
+        # Chirp mass as a time in seconds
+        self.mass_time = G * self.chirp_mass * SOLAR_MASS / C**3
+
+        self.coalescence_time = self.time_to_coalescence(self.start_frequency)
+        self.stop_time = self.coalescence_time - self.time_to_coalescence(self.max_frequency)
+
+    def time_to_coalescence(self, frequency):
+        return 5/256 * self.mass_time**(-5/3) * (np.pi * frequency)**(-8/3)
+
+    def frequency(self, t):
+        tau = np.maximum(self.coalescence_time - t, 1e-12)
+        return (5/256 / tau)**(3/8) * self.mass_time**(-5/8) / np.pi
+
+    def strain(self, t):
+        t = np.asarray(t, dtype=np.float64)
+        tau = np.maximum(self.coalescence_time - t, 1e-12)
+
+        phase = -2 * (tau / (5*self.mass_time))**(5/8) + self.phase
+        amplitude = self.amplitude * (tau / self.coalescence_time)**(-1/4)
+
+        return np.where((t < 0) | (t > self.stop_time), 0, amplitude * np.cos(phase))
+
+    def end_time(self):
+        return self.stop_time
+
+
+
+class FileStrain(StrainSource):
+    # Strain read from a .npy file or a text file with one sample per line
+    def __init__(self, path, sample_rate, scale=1, loop=False) -> None:
+        if path.endswith(".npy"):
+            self.samples = np.load(path).astype(np.float64).ravel()
+        else:
+            self.samples = np.loadtxt(path, dtype=np.float64).ravel()
+
+        self.samples *= scale
+        self.sample_rate = sample_rate
+        self.loop = loop
+
+        self.duration = len(self.samples) / self.sample_rate
+
+    def strain(self, t):
+        t = np.asarray(t, dtype=np.float64)
+        if self.loop:
+            t = np.mod(t, self.duration)
+
+        # Linear interpolation between file samples, zero outside the file
+        file_times = np.arange(len(self.samples)) / self.sample_rate
+        return np.interp(t, file_times, self.samples, left=0, right=0)
+
+    def end_time(self):
+        return None if self.loop else self.duration
+
+
+
+def strain_chunks(source, sample_rate=16000, chunk_size=4096, start_time=0):
+    # Generator of (times, strain) arrays of chunk_size samples each
+    sample = int(round(start_time * sample_rate))
+    offsets = np.arange(chunk_size)
+    end_time = source.end_time()
+
+    while end_time is None or sample / sample_rate <= end_time:
+        t = (sample + offsets) / sample_rate
+        yield t, source.strain(t)
+        sample += chunk_size
+
+
+def apply_strain(top_path, right_path, h):
+    # A wave with strain h stretches one arm and squeezes the other
+    top_path = np.asarray(top_path, dtype=np.float64)
+    right_path = np.asarray(right_path, dtype=np.float64)
+    return top_path * (1 + h/2), right_path * (1 - h/2)
+
+
+def detector_blocks(engine, top_path, right_path, chunks):
+    # Detector response for each chunk of strain, yields (times, strain, Response)
+    for t, h in chunks:
+        yield t, h, engine.evaluate_paths(*apply_strain(top_path, right_path, h))
+
+
+
+class StrainStream():
+    # Hands out the samples of a chunked source that fall inside each time step
+    def __init__(self, source, sample_rate=16000, chunk_size=4096) -> None:
+        self.source = source
+        self.sample_rate = sample_rate
+        self.chunk_size = chunk_size
+
+        self.reset()
+
+    def reset(self):
+        self.chunks = strain_chunks(self.source, self.sample_rate, self.chunk_size)
+        self.time = 0
+        self.samples_due = 0
+
+        self.times = np.empty(0)
+        self.strain = np.empty(0)
+
+    def advance(self, delta_time):
+        # Returns the (times, strain) samples covering the next delta_time seconds
+        self.time += delta_time
+        wanted = int(self.time * self.sample_rate) - self.samples_due
+        self.samples_due += wanted
+
+        while len(self.strain) < wanted:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                # Source has ended, pad with silence
+                missing = wanted - len(self.strain)
+                last = self.times[-1] if len(self.times) else self.time
+                chunk = (last + np.arange(1, missing + 1) / self.sample_rate, np.zeros(missing))
+
+            self.times = np.concatenate((self.times, chunk[0]))
+            self.strain = np.concatenate((self.strain, chunk[1]))
+
+        times, self.times = self.times[:wanted], self.times[wanted:]
+        strain, self.strain = self.strain[:wanted], self.strain[wanted:]
+        return times, strain
@@ -0,0 +1,136 @@
+import os
+import sys
+import json
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from physics import InterferometerEngine
+from strain import apply_strain
+
+# Parameter sweeps of the headless interferometer over a process pool.
+# The grid is wavelength x top mirror position x right mirror position x strain
+# amplitude. Workers write their block of the grid straight into one memory
+# mapped .npy file, and a companion .done.npy file records finished blocks so
+# an interrupted sweep can pick up where it stopped with --resume.
+#
+# python sweep.py intensity.npy --wavelength 500:1100:61 --top 5:375:371 --right 425:795:371 --strain 0:1e-3:5
+
+AMPLITUDE = 0.5
+CENTRE = (400, 400) # beam splitter position used by main.py, in pixels
+
+
+
+def parse_range(text):
+    # "start:stop:num" is an inclusive linspace, a single number is one value
+    parts = text.split(":")
+    if len(parts) == 1:
+        return np.array([float(parts[0])])
+    if len(parts) != 3:
+        raise argparse.ArgumentTypeError(f"expected start:stop:num, got {text}")
+
+    return np.linspace(float(parts[0]), float(parts[1]), int(parts[2]))
+
+
+def sidecar_paths(output):
+    base = output[:-4] if output.endswith(".npy") else output
+    return base + ".json", base + ".done.npy"
+
+
+def grid_tasks(grid, block_rows):
+    # One task per wavelength and block of top mirror positions
+    tasks = []
+    for i in range(len(grid["wavelength"])):
+        for start in range(0, len(grid["top"]), block_rows):
+            tasks.append((i, start, min(start + block_rows, len(grid["top"]))))
+    return tasks
+
+
+
+def run_task(output, grid, task):
+    wavelength_index, top_start, top_end = task
+    engine = InterferometerEngine(grid["wavelength"][wavelength_index], AMPLITUDE, centre=CENTRE)
+
+    # Broadcast to (top, right, strain)
+    top_pos = np.asarray(grid["top"][top_start:top_end])[:, None, None]
+    right_pos = np.asarray(grid["right"])[None, :, None]
+    strain = np.asarray(grid["strain"])[None, None, :]
+
+    top_path, right_path = engine.path_distances(top_pos, right_pos)
+    intensity = engine.evaluate_paths(*apply_strain(top_path, right_path, strain)).intensity
+
+    results = np.lib.format.open_memmap(output, mode="r+")
+    results[wavelength_index, top_start:top_end] = intensity
+    results.flush()
+    del results
+
+    return task
+
+
+def save_done(done_path, done):
+    # Written to a temporary file and renamed over the old one, so an interruption never leaves half a file
+    temp_path = done_path + ".tmp"
+    with open(temp_path, "wb") as file:
+        np.save(file, done)
+    os.replace(temp_path, done_path)
+
+
+def sweep(output, grid, workers=None, block_rows=16, resume=False):
+    metadata_path, done_path = sidecar_paths(output)
+    shape = (len(grid["wavelength"]), len(grid["top"]), len(grid["right"]), len(grid["strain"]))
+    tasks = grid_tasks(grid, block_rows)
+
+    metadata = {name: np.asarray(values).tolist() for name, values in grid.items()}
+    metadata["block_rows"] = block_rows
+
+    if resume and os.path.exists(output) and os.path.exists(done_path):
+        with open(metadata_path) as file:
+            if json.load(file) != metadata:
+                raise ValueError(f"{output} was made with a different grid, can't resume it")
+        done = np.load(done_path)
+    else:
+        results = np.lib.format.open_memmap(output, mode="w+", dtype=np.float64, shape=shape)
+        del results
+        with open(metadata_path, "w") as file:
+            json.dump(metadata, file)
+        done = np.zeros(len(tasks), dtype=bool)
+        save_done(done_path, done)
+
+    remaining = [i for i in range(len(tasks)) if not done[i]]
+    print(f"{len(remaining)} of {len(tasks)} blocks to compute")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_task, output, grid, tasks[i]): i for i in remaining}
+        for n, future in enumerate(as_completed(futures), 1):
+            future.result()
+            done[futures[future]] = True
+
+            # Written after every block so an interruption loses at most the blocks in flight
+            save_done(done_path, done)
+            print(f"\r{n}/{len(remaining)} blocks", end="", flush=True)
+
+    print()
+    return np.load(output, mmap_mode="r")
+
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep the interferometer intensity over a parameter grid")
+    parser.add_argument("output", help=".npy file for the intensity grid")
+    parser.add_argument("--wavelength", type=parse_range, default=parse_range("1064"), help="wavelengths in nm, start:stop:num")
+    parser.add_argument("--top", type=parse_range, default=parse_range("5:375:371"), help="top mirror y positions in pixels")
+    parser.add_argument("--right", type=parse_range, default=parse_range("425:795:371"), help="right mirror x positions in pixels")
+    parser.add_argument("--strain", type=parse_range, default=parse_range("0"), help="strain amplitudes")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, defaults to the number of cores")
+    parser.add_argument("--block-rows", type=int, default=16, help="top mirror positions per task")
+    parser.add_argument("--resume", action="store_true", help="continue an interrupted sweep into the same output")
+    args = parser.parse_args(argv)
+
+    grid = {"wavelength": args.wavelength, "top": args.top, "right": args.right, "strain": args.strain}
+    sweep(args.output, grid, args.workers, args.block_rows, args.resume)
+    return 0
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Tests import the top level modules and run pygame without a display
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
@@ -0,0 +1,76 @@
+import pygame
+import pytest
+
+
+@pytest.fixture
+def app():
+    import main as app
+    app.setup()
+    app.pending_mouse_events.clear()
+    return app
+
+
+def mouse_event(kind, pos, **fields):
+    return pygame.event.Event(kind, pos=pos, **fields)
+
+
+def test_drag_within_one_frame(app):
+    mirror = app.interferometer.right_mirror
+    x, y = mirror.pos
+
+    events = [
+        mouse_event(pygame.MOUSEBUTTONDOWN, (x, y), button=1),
+        mouse_event(pygame.MOUSEMOTION, (x - 40, y), rel=(-40, 0), buttons=(1, 0, 0)),
+        mouse_event(pygame.MOUSEBUTTONUP, (x - 40, y), button=1),
+    ]
+    app.simulate_frame(1 / app.PHYSICS_RATE, events)
+
+    assert mirror.pos == (x - 40, y)
+    assert not mirror.drag
+
+
+def test_tilt_within_one_frame(app):
+    mirror = app.interferometer.top_mirror
+    x, y = mirror.pos
+
+    events = [
+        mouse_event(pygame.MOUSEBUTTONDOWN, (x, y), button=3),
+        mouse_event(pygame.MOUSEMOTION, (x + 20, y), rel=(20, 0), buttons=(0, 0, 1)),
+        mouse_event(pygame.MOUSEBUTTONUP, (x + 20, y), button=3),
+    ]
+    app.simulate_frame(1 / app.PHYSICS_RATE, events)
+
+    assert mirror.tilt != 0
+    assert not mirror.tilting
+
+
+def test_interpolates_over_last_step(app):
+    mirror = app.interferometer.right_mirror
+    x, y = mirror.pos
+    app.simulate_frame(1 / app.PHYSICS_RATE, [mouse_event(pygame.MOUSEBUTTONDOWN, (x, y), button=1)])
+
+    # Three steps in one frame with one move in each, and half a step left over
+    events = [mouse_event(pygame.MOUSEMOTION, (x - 10 * n, y), rel=(-10, 0), buttons=(1, 0, 0)) for n in (1, 2, 3)]
+    app.simulate_frame(3.5 / app.PHYSICS_RATE, events)
+
+    assert mirror.previous_pos == (x - 20, y)
+    assert mirror.pos == (x - 30, y)
+    assert mirror.interpolated_pos(app.scheduler.alpha) == pytest.approx((x - 25, y))
+
+
+def test_tilt_leaves_rotation_cache_to_drawing(app):
+    mirror = app.interferometer.top_mirror
+    x, y = mirror.pos
+    mirror.draw()
+    cached = list(app.rotation_cache)
+
+    # Tilting runs on the simulation thread in threaded mode, only drawing touches the cache
+    events = [
+        mouse_event(pygame.MOUSEBUTTONDOWN, (x, y), button=3),
+        mouse_event(pygame.MOUSEMOTION, (x + 20, y), rel=(20, 0), buttons=(0, 0, 1)),
+    ]
+    app.simulate_frame(1 / app.PHYSICS_RATE, events)
+    assert list(app.rotation_cache) == cached
+
+    mirror.draw()
+    assert [key for key in app.rotation_cache if key[0] is mirror.original_image] == [(mirror.original_image, mirror.rotation)]
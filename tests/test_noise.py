@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from noise import DisplacementNoise, low_pass, pole_for
+
+
+@pytest.mark.parametrize("sample_rate", [10, 50, 100, 200, 500, 1000, 16000])
+def test_output_is_finite(sample_rate):
+    noise = DisplacementNoise(sample_rate)
+    samples = np.concatenate([noise.chunk(1024) for i in range(4)])
+    assert np.all(np.isfinite(samples))
+
+
+@pytest.mark.parametrize("pole", [pole_for(100, 100), pole_for(100, 1000), pole_for(1, 1000)])
+def test_low_pass_matches_recursion(pole):
+    white = np.random.default_rng(0).standard_normal(1000)
+
+    expected = np.empty_like(white)
+    state = 0.3
+    for n, value in enumerate(white):
+        state = pole * state + value
+        expected[n] = state
+
+    out, last = low_pass(white, pole, 0.3)
+    assert np.allclose(out, expected)
+    assert last == out[-1]
@@ -0,0 +1,49 @@
+import numpy as np
+
+from recorder import DataRecorder, load_recording
+
+
+def record(recorder, start, n):
+    for i in range(start, start + n):
+        recorder.record((i, 0, 0, 0, i / 10))
+
+
+def test_clear_keeps_pending_export(tmp_path):
+    path = tmp_path / "data.ifr"
+    text_path = tmp_path / "data.txt"
+    recorder = DataRecorder(path, chunk_rows=8)
+
+    record(recorder, 0, 20)
+    recorder.export(text_path)
+    recorder.clear()
+    record(recorder, 100, 5)
+    recorder.close()
+
+    # The export saw every row from before the clear and none after it
+    lines = text_path.read_text().splitlines()
+    assert len(lines) == 20
+    assert lines[-1].startswith("Time: 19")
+
+    assert np.array_equal(load_recording(path)["time"], np.arange(100, 105))
+
+
+def test_clear_drops_unflushed_rows(tmp_path):
+    path = tmp_path / "data.ifr"
+    recorder = DataRecorder(path, chunk_rows=64)
+
+    record(recorder, 0, 10)
+    recorder.clear()
+    assert recorder.rows == 0
+    recorder.close()
+
+    assert len(load_recording(path)) == 0
+
+
+def test_reset_and_save_keys_without_recorder():
+    import pygame
+    import main as app
+
+    app.setup()
+    app.recorder = None
+    keys = [pygame.event.Event(pygame.KEYDOWN, key=key, mod=0, unicode="") for key in (pygame.K_r, pygame.K_s)]
+    app.simulate_frame(1 / app.PHYSICS_RATE, keys)
@@ -0,0 +1,89 @@
+import numpy as np
+import pygame
+import pytest
+
+import search
+from recorder import DataRecorder, load_recording
+from strain import ChirpStrain
+
+
+def record_app_session(path, seconds):
+    # A recording made the way main.py makes one, with the graph sampling the detector
+    import main as app
+
+    app.setup()
+    app.recorder = DataRecorder(path)
+    app.simulate_frame(0.01, [pygame.event.Event(pygame.KEYDOWN, key=pygame.K_g, mod=0, unicode="")])
+    for frame in range(int(seconds * 100)):
+        app.simulate_frame(0.01, [])
+    app.recorder.close()
+    app.recorder = None
+
+
+def test_app_recording_is_at_detector_rate(tmp_path):
+    import main as app
+
+    path = str(tmp_path / "data.ifr")
+    record_app_session(path, 2)
+
+    recording = load_recording(path)
+    times = np.asarray(recording["time"])
+    assert np.allclose(np.diff(times), 1 / app.DETECTOR_SAMPLE_RATE)
+    assert search.sample_rate_of(times) == pytest.approx(app.DETECTOR_SAMPLE_RATE)
+
+    rows = np.column_stack((times, recording["intensity"]))
+    assert search.search_rows(rows, [2.0], workers=1) == []
+
+
+def test_slow_recording_is_rejected_clearly(tmp_path):
+    path = str(tmp_path / "slow.ifr")
+    recorder = DataRecorder(path)
+    for n in range(20):
+        recorder.record((n / 10, 0, 0, 0, 0.5))
+    recorder.close()
+
+    recording = load_recording(path)
+    rows = np.column_stack((recording["time"], recording["intensity"]))
+
+    with pytest.raises(ValueError, match="sample rate"):
+        search.search_rows(rows, [2.0], workers=1)
+
+    with pytest.raises(SystemExit):
+        search.main([path, "--workers", "1"])
+
+
+def test_too_few_rows(tmp_path):
+    path = str(tmp_path / "short.ifr")
+    recorder = DataRecorder(path)
+    recorder.record((0, 0, 0, 0, 0.5))
+    recorder.close()
+
+    recording = load_recording(path)
+    with pytest.raises(ValueError, match="at least 2 samples"):
+        search.sample_rate_of(np.asarray(recording["time"]))
+
+    with pytest.raises(SystemExit):
+        search.main([path, "--workers", "1"])
+
+
+def test_finds_chirp_in_recording(tmp_path, capsys):
+    rate = 4000
+    rng = np.random.default_rng(0)
+    values = 0.5 + 0.01 * rng.normal(0, 1, 40 * rate)
+
+    chirp = ChirpStrain(1, 4.0, 50, 1000)
+    h = chirp.strain(np.arange(int(chirp.end_time() * rate) + 1) / rate)
+    merger = 25 * rate
+    values[merger - len(h) + 1:merger + 1] += 0.01 * 15 / np.sqrt(np.sum(h**2)) * h
+
+    path = str(tmp_path / "chirp.ifr")
+    recorder = DataRecorder(path)
+    times = 5 + np.arange(len(values)) / rate
+    for time, value in zip(times, values):
+        recorder.record((time, 0, 0, 0, value))
+    recorder.close()
+
+    search.main([path, "--min-mass", "3.9", "--max-mass", "4.1", "--templates", "21", "--workers", "1", "--threshold", "8"])
+    output = capsys.readouterr().out
+    assert "t = 30.00" in output
+    assert "1 triggers" in output